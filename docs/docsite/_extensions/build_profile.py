@@ -0,0 +1,270 @@
+"""Sphinx extension timing the reading, resolving and writing of each document.
+
+Enable it with the ``profile`` tag, for example ``make core_htmldocs EXTRA_TAGS='-t profile'``.
+
+Every process of the build, including the ones Sphinx forks for ``-j``, appends the events it
+sees to a file in the doctree directory. When the build finishes, the documents are written to
+``profile.txt`` in the build directory, slowest first, and their phases to ``profile_trace.json``,
+which chrome://tracing and Perfetto can load. The phases of a document are:
+
+read
+    From ``source-read`` to ``doctree-read``: parsing and the read transforms.
+resolve
+    From the first post-transform to ``doctree-resolved``: resolving references.
+write
+    From ``doctree-resolved``, or the page the same process wrote before, or the start of the worker,
+    to ``html-page-context``: resolving toctrees and translating the doctree to HTML. Rendering the
+    page template is not included.
+
+The singlehtml builder resolves and writes all documents as one, under the root document.
+
+Memory is the growth of the peak resident set size of the process during the phase, so the
+documents that make the build need more memory stand out.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import resource
+import sys
+import time
+import typing as t
+from pathlib import Path
+
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinx.transforms.post_transforms import SphinxPostTransform
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of slowest documents logged at the end of the build. profile.txt lists all of them.
+TOP_DOCUMENTS = 20
+
+PHASES = ("read", "resolve", "write")
+
+
+class Phase(t.NamedTuple):
+    docname: str
+    name: str
+    pid: int
+    start: int
+    end: int
+    memory: int
+
+
+def events_dir(app: Sphinx) -> Path:
+    return Path(app.doctreedir) / "profile"
+
+
+def peak_rss_kib() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other systems kibibytes.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def record(app: Sphinx, event: str, docname: str) -> None:
+    """Append an event of this process to its events file."""
+    with open(
+        events_dir(app) / f"events-{os.getpid()}.jsonl", "a", encoding="utf-8"
+    ) as events_file:
+        events_file.write(
+            json.dumps([event, docname, time.perf_counter_ns(), peak_rss_kib()]) + "\n"
+        )
+
+
+class ResolveStart(SphinxPostTransform):
+    """Record where the post-transforms of a document, which Sphinx has no event for, start."""
+
+    default_priority = 0
+
+    def run(self, **kwargs: t.Any) -> None:
+        record(self.app, "resolve-start", self.env.docname)
+
+
+def on_builder_inited(app: Sphinx) -> None:
+    events_dir(app).mkdir(parents=True, exist_ok=True)
+
+    for path in events_dir(app).glob("events-*.jsonl"):
+        path.unlink()
+
+
+def on_source_read(app: Sphinx, docname: str, source: list[str]) -> None:
+    record(app, "source-read", docname)
+
+
+def on_doctree_read(app: Sphinx, doctree: nodes.document) -> None:
+    record(app, "doctree-read", app.env.docname)
+
+
+def on_doctree_resolved(app: Sphinx, doctree: nodes.document, docname: str) -> None:
+    record(app, "doctree-resolved", docname)
+
+
+def on_html_page_context(
+    app: Sphinx,
+    pagename: str,
+    templatename: str,
+    context: dict[str, t.Any],
+    doctree: nodes.document | None,
+) -> None:
+    # Pages such as the index and the search page are not documents.
+    if doctree is not None:
+        record(app, "html-page-context", pagename)
+
+
+def load_events(app: Sphinx) -> dict[int, list[list[t.Any]]]:
+    """Return the events of each process, by process ID, in the order they happened."""
+    events = {}
+
+    for path in events_dir(app).glob("events-*.jsonl"):
+        with open(path, encoding="utf-8") as events_file:
+            events[int(path.stem.split("-", 1)[1])] = [
+                json.loads(line) for line in events_file
+            ]
+
+    return events
+
+
+def collect_phases(events: dict[int, list[list[t.Any]]]) -> list[Phase]:
+    # A document is resolved in the main process, but may be written in a worker.
+    resolved = {
+        docname: ts
+        for pid_events in events.values()
+        for event, docname, ts, _rss in pid_events
+        if event == "doctree-resolved"
+    }
+    phases = []
+
+    for pid, pid_events in events.items():
+        started: dict[tuple[str, str], tuple[int, int]] = {}
+        previous: tuple[int, int] | None = None
+
+        for event, docname, ts, rss in pid_events:
+            if event == "source-read":
+                started["read", docname] = ts, rss
+            elif event == "resolve-start":
+                started["resolve", docname] = ts, rss
+            elif event in ("doctree-read", "doctree-resolved"):
+                name = "read" if event == "doctree-read" else "resolve"
+
+                if (name, docname) in started:
+                    start, start_rss = started.pop((name, docname))
+                    phases.append(Phase(docname, name, pid, start, ts, rss - start_rss))
+            elif event == "html-page-context" and previous is not None:
+                # The previous event of a worker writing pages is the fork it started with or the previous page.
+                start, start_rss = previous
+                start = max(start, resolved.get(docname, start))
+                phases.append(Phase(docname, "write", pid, start, ts, rss - start_rss))
+
+            previous = ts, rss
+
+    return phases
+
+
+def write_report(app: Sphinx, phases: list[Phase], peak_rss: int) -> None:
+    totals: dict[str, dict[str, float]] = {}
+
+    for phase in phases:
+        document = totals.setdefault(
+            phase.docname, dict.fromkeys(PHASES + ("total", "memory"), 0)
+        )
+        document[phase.name] += (phase.end - phase.start) / 1e6
+        document["total"] += (phase.end - phase.start) / 1e6
+        document["memory"] += phase.memory
+
+    documents = sorted(totals.items(), key=lambda item: item[1]["total"], reverse=True)
+    report_path = Path(app.doctreedir).parent / "profile.txt"
+
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        report_file.write(
+            f"Peak resident set size of a process: {peak_rss / 1024:.1f} MiB\n"
+        )
+
+        for name in PHASES:
+            duration = sum(document[name] for _docname, document in documents)
+            report_file.write(f"Total {name} time: {duration / 1000:.1f} s\n")
+
+        report_file.write(
+            "\n  total ms    read ms resolve ms   write ms   +mem KiB  document\n"
+        )
+
+        for docname, document in documents:
+            report_file.write(
+                f"{document['total']:10.1f} {document['read']:10.1f} {document['resolve']:10.1f}"
+                f" {document['write']:10.1f} {document['memory']:10.0f}  {docname}\n"
+            )
+
+    logger.info("Slowest documents, see %s for all of them:", report_path)
+
+    for docname, document in documents[:TOP_DOCUMENTS]:
+        logger.info("  %10.1f ms  %s", document["total"], docname)
+
+
+def write_trace(
+    app: Sphinx, events: dict[int, list[list[t.Any]]], phases: list[Phase]
+) -> None:
+    """Write the phases, and the peak memory of each process over time, as a Chrome trace event file."""
+    trace_events = [
+        {
+            "name": phase.name,
+            "ph": "X",
+            "ts": phase.start / 1000,
+            "dur": (phase.end - phase.start) / 1000,
+            "pid": phase.pid,
+            "tid": phase.pid,
+            "args": {"docname": phase.docname, "memory_kib": phase.memory},
+        }
+        for phase in phases
+    ]
+
+    for pid, pid_events in events.items():
+        trace_events.extend(
+            {
+                "name": "peak rss",
+                "ph": "C",
+                "ts": ts / 1000,
+                "pid": pid,
+                "args": {"KiB": rss},
+            }
+            for _event, _docname, ts, rss in pid_events
+        )
+
+    with open(
+        Path(app.doctreedir).parent / "profile_trace.json", "w", encoding="utf-8"
+    ) as trace_file:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, trace_file)
+
+
+def on_build_finished(app: Sphinx, exception: Exception | None) -> None:
+    if exception is not None:
+        return
+
+    events = load_events(app)
+    phases = collect_phases(events)
+    peak_rss = max(
+        [peak_rss_kib()]
+        + [rss for pid_events in events.values() for *_rest, rss in pid_events]
+    )
+
+    write_report(app, phases, peak_rss)
+    write_trace(app, events, phases)
+
+
+def setup(app: Sphinx) -> dict[str, bool | str]:
+    # Workers Sphinx forks for -j have no event of their own when they start writing pages.
+    os.register_at_fork(after_in_child=lambda: record(app, "fork", ""))
+
+    app.add_post_transform(ResolveStart)
+    app.connect("builder-inited", on_builder_inited)
+    app.connect("source-read", on_source_read)
+    app.connect("doctree-read", on_doctree_read)
+    app.connect("doctree-resolved", on_doctree_resolved)
+    app.connect("html-page-context", on_html_page_context)
+    app.connect("build-finished", on_build_finished)
+
+    return {
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""Time a docs build and fail if it got slower than the last comparable run.
+
+The rst generation and the Sphinx build are timed separately. The Sphinx build runs with the
+``profile`` tag (see _extensions/build_profile.py), which gives the durations of its read and
+write phases. The Sphinx build goes to a temporary build directory, so it always starts cold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+DOCS_DIR = pathlib.Path(__file__).resolve().parent
+ROOT = DOCS_DIR.parent.parent
+HISTORY_PATH = ROOT / ".cache" / "docs" / "build-benchmarks.jsonl"
+
+# Targets that can be timed, with the targets generating their rst.
+TARGETS = {
+    "core_htmldocs": ["core_structure", "core_generate_rst"],
+    "htmldocs": ["ansible_structure", "generate_rst"],
+}
+
+sys.path.insert(0, str(ROOT / "tests" / "checkers"))
+
+from _benchmark import append_record, compare, find_previous, make_record  # noqa: E402
+from _docsite import GENERATOR_VARIABLES  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--target",
+        choices=sorted(TARGETS),
+        default="core_htmldocs",
+        help="make target to time (default: core_htmldocs)",
+    )
+    parser.add_argument(
+        "--history",
+        type=pathlib.Path,
+        default=HISTORY_PATH,
+        help=f"JSON Lines file the results are appended to (default: {HISTORY_PATH.relative_to(ROOT)})",
+    )
+    parser.add_argument(
+        "--max-regression",
+        metavar="PERCENT",
+        type=float,
+        help="fail if a duration is more than PERCENT longer than in the previous comparable run",
+    )
+
+    args = parser.parse_args()
+
+    generate_seconds = time_make(TARGETS[args.target])
+
+    with tempfile.TemporaryDirectory(prefix="docs-benchmark-") as build_dir:
+        sphinx_seconds = time_make(
+            [args.target, f"BUILDDIR={build_dir}", "EXTRA_TAGS=-t profile"]
+            + [f"{variable}=:" for variable in GENERATOR_VARIABLES]
+        )
+        read_seconds, write_seconds = sphinx_phases(
+            pathlib.Path(build_dir) / "profile_trace.json"
+        )
+        output_bytes = directory_size(pathlib.Path(build_dir) / "html")
+
+    durations = dict(
+        generate_rst=generate_seconds,
+        sphinx_read=read_seconds,
+        sphinx_write=write_seconds,
+        sphinx=sphinx_seconds,
+        total=generate_seconds + sphinx_seconds,
+    )
+    results = {
+        name: dict(seconds=round(seconds, 3)) for name, seconds in durations.items()
+    }
+
+    for name, seconds in durations.items():
+        print(f"{name}: {seconds:.1f} s", file=sys.stderr)
+
+    print(f"output: {output_bytes / 1024 / 1024:.1f} MiB", file=sys.stderr, flush=True)
+
+    record = make_record(results, target=args.target, output_bytes=output_bytes)
+    previous = find_previous(args.history, record, ("target",))
+    regressions = compare(previous, record, args.max_regression) if previous else []
+
+    if previous:
+        # The size of the output is only reported.
+        print(
+            f'  output: {previous["output_bytes"] / 1024 / 1024:.1f} MiB -> {output_bytes / 1024 / 1024:.1f} MiB',
+            file=sys.stderr,
+            flush=True,
+        )
+
+    append_record(args.history, record)
+
+    if regressions:
+        sys.exit(
+            f'Regression of more than {args.max_regression}% in: {", ".join(regressions)}'
+        )
+
+
+def time_make(arguments: list[str]) -> float:
+    """Return the wall time of running make in the docs directory, exiting with its output if it fails."""
+    cmd = ["make"] + arguments
+    print(f'Running {" ".join(cmd)}', file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        cmd,
+        cwd=DOCS_DIR,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    seconds = time.perf_counter() - start
+
+    if result.returncode != 0:
+        sys.exit(
+            f'Command {" ".join(cmd)!r} failed with status code {result.returncode}:\n{result.stdout}{result.stderr}'
+        )
+
+    return seconds
+
+
+def sphinx_phases(trace_path: pathlib.Path) -> tuple[float, float]:
+    """Return the wall times of the read phase and of the resolve and write phases of the profiled build."""
+    with open(trace_path, encoding="utf-8") as trace_file:
+        events = [
+            event
+            for event in json.load(trace_file)["traceEvents"]
+            if event["ph"] == "X"
+        ]
+
+    def span(names: tuple[str, ...]) -> float:
+        phases = [event for event in events if event["name"] in names]
+
+        if not phases:
+            return 0.0
+
+        start = min(event["ts"] for event in phases)
+        end = max(event["ts"] + event["dur"] for event in phases)
+
+        return (end - start) / 1e6
+
+    return span(("read",)), span(("resolve", "write"))
+
+
+def directory_size(directory: pathlib.Path) -> int:
+    return sum(
+        path.stat().st_size
+        for path in directory.rglob("*")
+        if path.is_file() and not path.is_symlink()
+    )
+
+
+if __name__ == "__main__":
+    main()
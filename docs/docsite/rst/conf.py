@@ -18,10 +18,12 @@ __metaclass__ = type
 
 import sys
 import os
+import datetime
 import tomllib
 from pathlib import Path
 
 from sphinx.application import Sphinx
+from sphinx.config import Config
 
 DOCS_ROOT_DIR = Path(__file__).parent.resolve()
 
@@ -383,12 +385,18 @@ autoclass_content = 'both'
 
 # Note:  Our strategy for intersphinx mappings is to have the upstream build location as the
 # canonical source.
+# Each inventory also has a cached copy, relative to this directory, which is refreshed with:
+#   hacking/build-ansible.py update-intersphinx-cache -c docs/docsite/rst/conf.py
+# The command also records when it downloaded each copy in a .timestamp file next to it.
+# setup() makes the build read a cached copy first while it is younger than
+# intersphinx_cache_max_age days, and otherwise only when the upstream one cannot be fetched.
+INTERSPHINX_CACHE_DIR = '../intersphinx_cache'
 intersphinx_mapping = {
-    'python': ('https://docs.python.org/2/', None),
-    'python3': ('https://docs.python.org/3/', None),
-    'jinja2': ('http://jinja.palletsprojects.com/', None),
-    'ansible_2_9': ('https://docs.ansible.com/ansible/2.9/', None),
-    'ansible_11': ('https://docs.ansible.com/ansible/11/', None),
+    'python': ('https://docs.python.org/2/', (None, f'{INTERSPHINX_CACHE_DIR}/python.inv')),
+    'python3': ('https://docs.python.org/3/', (None, f'{INTERSPHINX_CACHE_DIR}/python3.inv')),
+    'jinja2': ('http://jinja.palletsprojects.com/', (None, f'{INTERSPHINX_CACHE_DIR}/jinja2.inv')),
+    'ansible_2_9': ('https://docs.ansible.com/ansible/2.9/', (None, f'{INTERSPHINX_CACHE_DIR}/ansible_2_9.inv')),
+    'ansible_11': ('https://docs.ansible.com/ansible/11/', (None, f'{INTERSPHINX_CACHE_DIR}/ansible_11.inv')),
 }
 
 # linckchecker settings
@@ -397,9 +405,50 @@ linkcheck_ignore = [
 linkcheck_workers = 25
 # linkcheck_anchors = False
 
+def intersphinx_cache_age(cache_path: str) -> float | None:
+    """Return the seconds since update-intersphinx-cache downloaded a cached inventory, or None if unknown.
+
+    The download time is read from the .timestamp file the command writes, as the mtime of the
+    inventory is the time it was checked out.
+    """
+    try:
+        with open(cache_path + '.timestamp', encoding='utf-8') as timestamp_file:
+            downloaded = datetime.datetime.fromisoformat(timestamp_file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+    if downloaded.tzinfo is None:
+        downloaded = downloaded.replace(tzinfo=datetime.timezone.utc)
+
+    return (datetime.datetime.now(datetime.timezone.utc) - downloaded).total_seconds()
+
+
+def prefer_fresh_intersphinx_cache(app: Sphinx, config: Config) -> None:
+    """Read the cached copies of the intersphinx inventories before the upstream ones while they are fresh.
+
+    Copies without a known download time are only read when the upstream inventory cannot be fetched.
+    """
+    max_age = config.intersphinx_cache_max_age * 24 * 60 * 60
+
+    for name, (uri, inventories) in config.intersphinx_mapping.items():
+        if not isinstance(inventories, tuple) or len(inventories) != 2 or inventories[0] is not None:
+            continue
+
+        cache_file = inventories[1]
+        age = intersphinx_cache_age(os.path.join(app.srcdir, cache_file))
+
+        if age is not None and age <= max_age:
+            config.intersphinx_mapping[name] = (uri, (cache_file, None))
+
+
 # Generate redirects for pages when building on Read The Docs
 def setup(app: Sphinx) -> dict[str, bool | str]:
 
+    # Override with -D intersphinx_cache_max_age=0 to fetch the upstream inventories first.
+    app.add_config_value('intersphinx_cache_max_age', 30, '')
+    # Runs before sphinx.ext.intersphinx normalizes the mapping.
+    app.connect('config-inited', prefer_fresh_intersphinx_cache)
+
     if 'redirects' in app.tags:
 
         redirects_config_path = DOCS_ROOT_DIR.parent / "declarative-configs" / "ansible_redirects.toml"
@@ -410,6 +459,11 @@ def setup(app: Sphinx) -> dict[str, bool | str]:
         app.config.redirect_html_template_file = redirect_template
         app.setup_extension('sphinx_reredirects') # redirect pages that have been restructured or removed
 
+    # Time the reading, resolving and writing of each document, see _extensions/build_profile.py
+    if 'profile' in app.tags:
+        sys.path.insert(0, str(DOCS_ROOT_DIR.parent / '_extensions'))
+        app.setup_extension('build_profile')
+
     return {
         "parallel_read_safe": True,
         "parallel_write_safe": True,
@@ -7,6 +7,7 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 
+import datetime
 import importlib
 import pathlib
 import urllib.parse
@@ -86,10 +87,16 @@ class UpdateIntersphinxCache(Command):
             # Retrieve the inventory and cache it
             # The jinja CDN seems to be blocking the default urllib User-Agent
             requestor = Request(headers={'User-Agent': 'Definitely Not Python ;-)'})
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
             with requestor.open('GET', url) as source_file:
                 with open(cache_file, 'wb') as f:
                     f.write(source_file.read())
 
-        print('Download of new cache files complete.  Remember to git commit -a the changes')
+            # Record the download time, which conf.py compares with intersphinx_cache_max_age. Unlike the
+            # mtime of the cache file, it does not change when the file is checked out.
+            timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+            cache_file.with_name(cache_file.name + '.timestamp').write_text(timestamp + '\n')
+
+        print('Download of new cache files complete.  Remember to git add docs/docsite/intersphinx_cache/ and commit the changes')
 
         return 0
@@ -15,7 +15,12 @@ LINT_FILES: tuple[str, ...] = (
     "hacking/tagger/tag.py",
     "noxfile.py",
     *iglob("docs/bin/*.py"),
+    "docs/docsite/build_benchmark.py",
+    "docs/docsite/_extensions/build_profile.py",
+    "tests/checkers_benchmark.py",
     *iglob("tests/checkers/rst-yamllint*.py"),  # TODO: also lint others
+    "tests/checkers/rst-lint.py",
+    *iglob("tests/checkers/_*.py"),
 )
 PINNED = os.environ.get("PINNED", "true").lower() in {"1", "true"}
 nox.options.sessions = ("clone-core", "lint", "checkers", "make")
@@ -213,8 +218,15 @@ def clone_core(session: nox.Session):
     session.run_always("python", "docs/bin/clone-core.py", *session.posargs)
 
 
+# Checkers left out of the checkers session, each has an opt-in session of its own.
+OPT_IN_CHECKERS = {"rst-lint"}
+
+# Modules starting with an underscore are helpers shared by the checkers.
 checker_tests = [
-    path.with_suffix("").name for path in Path("tests/checkers/").glob("*.py")
+    path.with_suffix("").name
+    for path in Path("tests/checkers/").glob("*.py")
+    if not path.name.startswith("_")
+    and path.with_suffix("").name not in OPT_IN_CHECKERS
 ]
 
 
@@ -249,6 +261,35 @@ def checkers(session: nox.Session, test: str):
     session.run("python", "tests/checkers.py", test)
 
 
+@nox.session(name="checkers(rst-lint)")
+def checkers_rst_lint(session: nox.Session):
+    """
+    Run the rstcheck and rst-yamllint checks on a single parse of each file
+    """
+
+    install(session, req="requirements")
+    session.run("python", "tests/checkers.py", "rst-lint")
+
+
+@nox.session(name="checkers-server")
+def checkers_server(session: nox.Session):
+    """
+    Run a server that keeps the docs checkers loaded. The checkers session and
+    tests/checkers.py send their checks to it while it is running.
+    """
+    install(session, req="requirements")
+    session.run("python", "tests/checkers.py", "--serve", *session.posargs)
+
+
+@nox.session(name="checkers-benchmark")
+def checkers_benchmark(session: nox.Session):
+    """
+    Benchmark the docs checkers against a synthetic rst corpus
+    """
+    install(session, req="requirements")
+    session.run("python", "tests/checkers_benchmark.py", *session.posargs)
+
+
 @nox.session
 def make(session: nox.Session):
     """
@@ -4,34 +4,174 @@
 from __future__ import annotations
 
 import argparse
+import collections
+import concurrent.futures
+import dataclasses
+import hashlib
+import importlib.util
 import json
 import os
 import pathlib
 import re
+import signal
+import socket
+import socketserver
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import traceback
+import types
+import typing as t
 
 
 ROOT = pathlib.Path(__file__).resolve().parent.parent
+CHECKERS_DIR = ROOT / 'tests' / 'checkers'
+CACHE_DIR = ROOT / '.cache' / 'checkers'
+SERVER_SOCKET = CACHE_DIR / 'server.sock'
+DOCS_SOURCE_DIR = ROOT / 'docs' / 'docsite' / 'rst'
+
+RESULT_RE = re.compile(r'^(?P<path>[^:]*):(?P<line>[0-9]+):(?P<col>[0-9]+): (?P<message>.*)$')
+CODE_RE = re.compile(r'^(?P<code>[a-z][a-z0-9-]*): (?P<message>.*)$')
+INCLUDE_RE = re.compile(r'^\s*\.\.\s+(?:literal)?include::\s*(?P<target>[^\s<]\S*)', re.MULTILINE)
+
+# Bump when the layout of the cache files changes.
+CACHE_VERSION = 1
+
+OUTPUT_FORMATS = ('text', 'jsonl', 'sarif')
+SARIF_LEVELS = {'error': 'error', 'warning': 'warning', 'info': 'note'}
+
+# Seconds between two scans of the docs tree by --watch when watchfiles is not installed.
+WATCH_POLL_INTERVAL = 0.5
+
+# Number of shards handed to each worker, so slow files do not leave other workers idle.
+SHARDS_PER_JOB = 4
+
+# Checker modules by path, with the mtime of the file they were loaded from.
+_checker_modules: dict[str, tuple[int, types.ModuleType]] = {}
+
+# Make helper modules shared by the checkers, such as _profiling, importable by the runner and its workers.
+sys.path.insert(0, str(CHECKERS_DIR))
+
+from _cache import INCREMENTAL_ENV, NO_CACHE_ENV, RUNNER_ENV, STREAM_ENV, caching_enabled  # noqa: E402
+from _profiling import PROFILE_ENV, PROFILER, REPORT_ENV, print_report, write_trace  # noqa: E402
+
+
+@dataclasses.dataclass(frozen=True)
+class RunOptions:
+    jobs: int = 1
+    use_cache: bool = True
+    changed: set[str] | None = None
+    stream: bool = False
+    fail_fast: int | None = None
+    profile: bool = False
+    server: str | None = None
 
 
 def main() -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument('test', nargs='+')
+    parser.add_argument('test', nargs='*')
+    parser.add_argument('--docs-dir', type=pathlib.Path, default=ROOT / 'docs',
+                        help='directory with the files to check (default: docs/)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes used by in-process checkers (default: number of CPUs)')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help=f'do not read or update the result and checker caches in {CACHE_DIR.relative_to(ROOT)}/')
+    parser.add_argument('--incremental', action='store_true',
+                        help='keep the docs-build build between runs and only rebuild what changed;'
+                             ' Sphinx only reports warnings found while reading for the documents it read again')
+    parser.add_argument('--changed-since', metavar='REF',
+                        help='only check files changed since the git REF, and the files that include them')
+    parser.add_argument('--stream', action='store_true',
+                        help='print results as they are produced instead of sorted at the end;'
+                             ' checker stderr is forwarded as progress and only fails the run with a non-zero exit status')
+    parser.add_argument('--fail-fast', metavar='N', type=int, nargs='?', const=1,
+                        help='stop after the first N results (default: 1) and skip the remaining checkers')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text',
+                        help='output format: path:line:col: message text, JSON Lines records or a SARIF 2.1.0 log (default: text)')
+    parser.add_argument('--profile', metavar='TRACE', nargs='?', const=str(CACHE_DIR / 'trace.json'),
+                        help='time checkers per file and phase, print the slowest files and write a Chrome trace event file'
+                             f' (default: {(CACHE_DIR / "trace.json").relative_to(ROOT)})')
+    parser.add_argument('--profile-top', metavar='N', type=int, default=20,
+                        help='number of slowest files to print with --profile (default: 20)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and re-check the files affected by each change in the docs directory')
+    parser.add_argument('--serve', action='store_true',
+                        help='run a server that keeps the in-process checkers loaded and runs checks for other invocations')
+    parser.add_argument('--socket', default=str(SERVER_SOCKET),
+                        help=f'Unix socket of the checker server (default: {SERVER_SOCKET.relative_to(ROOT)})')
+    parser.add_argument('--no-server', dest='use_server', action='store_false',
+                        help='check in this process even if a checker server is running')
 
     args = parser.parse_args()
+
+    if args.serve:
+        serve(args.socket)
+        return
+
+    if not args.test:
+        parser.error('at least one test is required')
+
+    if args.watch and (args.format == 'sarif' or args.profile):
+        parser.error('--watch cannot be combined with --format sarif or --profile')
     tests: list[str] = args.test
+
+    if not args.cache:
+        # Checkers keep their own caches, for example of linted snippets.
+        os.environ[NO_CACHE_ENV] = '1'
+
+    if args.incremental:
+        os.environ[INCREMENTAL_ENV] = '1'
+
+    options = RunOptions(
+        jobs=max(args.jobs, 1),
+        use_cache=args.cache,
+        changed=get_changed_files(args.changed_since) if args.changed_since else None,
+        stream=args.stream,
+        fail_fast=args.fail_fast,
+        profile=bool(args.profile),
+        server=args.socket if args.use_server and not args.watch else None,
+    )
+    index = FileIndex(args.docs_dir.resolve())
+    reporter = Reporter(args.format)
     failed = False
 
+    if args.watch:
+        watch(tests, index, options, reporter)
+        return
+
     for test in tests:
-        if run_test(test):
+        if run_test(test, index, options, reporter):
             failed = True
 
+            if options.fail_fast:
+                break
+
+    reporter.close()
+
+    if args.profile:
+        write_trace(PROFILER.events, args.profile)
+        print_report(PROFILER.events, args.profile_top)
+        print(f'Wrote trace events to {args.profile}', file=sys.stderr, flush=True)
+
     if failed:
         sys.exit(1)
 
 
-def run_test(name: str) -> bool:
+def run_test(name: str, index: FileIndex, options: RunOptions = RunOptions(), reporter: Reporter | None = None) -> bool:
+    reporter = reporter or Reporter()
+    PROFILER.enabled = options.profile
+
+    with PROFILER.span('checker', checker=name):
+        failed = _run_test(name, index, options, reporter)
+
+    reporter.summarize(name)
+
+    return failed
+
+
+def _run_test(name: str, index: FileIndex, options: RunOptions, reporter: Reporter) -> bool:
     print(f'Running {name!r} checker ...', file=sys.stderr, flush=True)
 
     checker_path = ROOT / 'tests' / 'checkers' / f'{name}.py'
@@ -42,41 +182,839 @@ def run_test(name: str) -> bool:
     except FileNotFoundError:
         config = {}
 
-    paths = []
-    extensions = set(config.get('extensions', []))
+    paths = index.select(config.get('extensions', []), config.get('ignore_regexs', []))
 
-    ignore_regexs = [
-        re.compile(regex)
-        for regex in config.get('ignore_regexs', [])
-    ]
+    if options.changed is not None and not changed_checker_inputs(checker_path, config, options.changed):
+        paths = select_affected(paths, options.changed, index, config.get('config_files', []))
+        print(f'Checking {len(paths)} file(s) affected by changes.', file=sys.stderr, flush=True)
 
-    for root, dir_names, file_names in os.walk(ROOT / 'docs'):
-        for file_name in file_names:
-            path = os.path.join(root, file_name)
-            ext = os.path.splitext(path)[1]
+    remote = bool(options.server) and server_supports(options.server, name)
 
-            rel_path = os.path.relpath(path, ROOT)
-            if any(regex.match(rel_path) for regex in ignore_regexs):
-                continue
+    if not remote:
+        options = dataclasses.replace(options, server=None)
 
-            if ext not in extensions:
-                continue
+    if remote or hasattr(load_checker(checker_path), 'check'):
+        cache = ResultCache.load(name, checker_digest(checker_path, config)) if options.use_cache else None
+        return run_in_process(checker_path, paths, options, cache, index, reporter, config.get('config_files', []))
 
-            paths.append(path)
+    cmd = [sys.executable, str(checker_path)] + paths
+
+    if not options.profile:
+        return run_subprocess(cmd, options, reporter)
+
+    with tempfile.TemporaryDirectory(prefix='checkers-profile-') as temp_dir:
+        trace_path = os.path.join(temp_dir, 'trace.json')
+        env = dict(os.environ, **{PROFILE_ENV: trace_path, REPORT_ENV: '0'})
+        failed = run_subprocess(cmd, options, reporter, env)
 
-    cmd = [sys.executable, checker_path] + paths
+        try:
+            with open(trace_path, encoding='utf-8') as trace_file:
+                PROFILER.events.extend(json.load(trace_file)['traceEvents'])
+        except FileNotFoundError:
+            pass
+
+    return failed
+
+
+def run_subprocess(
+    cmd: list[str],
+    options: RunOptions,
+    reporter: Reporter,
+    env: dict[str, str] | None = None,
+) -> bool:
+    env = dict(env or os.environ, **{RUNNER_ENV: '1'})
+
+    if options.stream or options.fail_fast:
+        return run_streaming(cmd, options.fail_fast, reporter, env)
 
     try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True, env=env)
     except subprocess.CalledProcessError as ex:
         print(ex, file=sys.stderr, flush=True)
         result = ex
 
-    sys.stdout.write(result.stdout)
+    for line in result.stdout.splitlines():
+        reporter.report_line(pathlib.Path(cmd[1]).stem, line)
+
     sys.stderr.write(result.stderr)
 
     return bool(result.stdout or result.stderr)
 
 
+def watch(tests: list[str], index: FileIndex, options: RunOptions, reporter: Reporter) -> None:
+    """Check everything once, then re-check the files affected by each change until interrupted."""
+    for test in tests:
+        if not hasattr(load_checker(CHECKERS_DIR / f'{test}.py'), 'check'):
+            sys.exit(f'The {test!r} checker does not support --watch.')
+
+    for test in tests:
+        run_test(test, index, options, reporter)
+
+    # Changed files are few, so they are checked in this process where the checkers and their config are already loaded.
+    options = dataclasses.replace(options, jobs=1)
+
+    try:
+        for changed in watch_changes(index.directory):
+            index.refresh(changed)
+            changed &= set(index.paths)
+
+            if not changed:
+                continue
+
+            start = time.perf_counter()
+            # Summaries count the results of this cycle only.
+            reporter.counts.clear()
+
+            for test in tests:
+                run_test(test, index, dataclasses.replace(options, changed=changed), reporter)
+
+            print(f'Checked {len(changed)} changed file(s) in {(time.perf_counter() - start) * 1000:.0f} ms.', file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+def watch_changes(directory: pathlib.Path) -> t.Iterator[set[str]]:
+    """Yield the sets of paths below ``directory`` that changed, using watchfiles (inotify) when it is installed."""
+    try:
+        import watchfiles
+    except ImportError:
+        watchfiles = None
+
+    print(f'Watching {directory} for changes{"" if watchfiles else " (polling)"} ...', file=sys.stderr, flush=True)
+
+    if watchfiles:
+        for changes in watchfiles.watch(directory):
+            yield {os.path.normpath(path) for change, path in changes}
+
+        return
+
+    snapshot = scan_mtimes(directory)
+
+    while True:
+        time.sleep(WATCH_POLL_INTERVAL)
+        current = scan_mtimes(directory)
+        changed = {path for path in snapshot.keys() | current.keys() if snapshot.get(path) != current.get(path)}
+        snapshot = current
+
+        if changed:
+            yield changed
+
+
+def scan_mtimes(directory: pathlib.Path) -> dict[str, tuple[int, int]]:
+    mtimes = {}
+
+    for root, dir_names, file_names in os.walk(directory):
+        for file_name in file_names:
+            path = os.path.join(root, file_name)
+
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            mtimes[path] = stat.st_mtime_ns, stat.st_size
+
+    return mtimes
+
+
+def load_checker(checker_path: pathlib.Path) -> types.ModuleType:
+    """Import a checker script as a module, reusing it if it was already imported by this process and did not change."""
+    key = str(checker_path)
+    mtime = checker_path.stat().st_mtime_ns
+
+    if key not in _checker_modules or _checker_modules[key][0] != mtime:
+        module_name = 'checker_' + checker_path.stem.replace('-', '_')
+        spec = importlib.util.spec_from_file_location(module_name, checker_path)
+        module = importlib.util.module_from_spec(spec)
+        # Register the module before running it, as for example dataclasses look it up while it is being run.
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        _checker_modules[key] = mtime, module
+
+    return _checker_modules[key][1]
+
+
+def find_checker(name: t.Any) -> pathlib.Path | None:
+    """Return the path of the checker called ``name`` in CHECKERS_DIR, or None if there is no such checker."""
+    if not isinstance(name, str) or name.startswith('_') or '/' in name or os.sep in name:
+        return None  # helper modules and paths outside of CHECKERS_DIR are not checkers
+
+    checker_path = CHECKERS_DIR / f'{name}.py'
+
+    return checker_path if checker_path in CHECKERS_DIR.glob('[!_]*.py') else None
+
+
+class CheckerServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Serve checks from a process that has all in-process checkers loaded, forking one child per request."""
+
+    # Requests run to completion in their own process, there is nothing to wait for on shutdown.
+    block_on_close = False
+
+
+class CheckerRequestHandler(socketserver.StreamRequestHandler):
+    """Handle one JSON request line and answer with one JSON line per shard."""
+
+    def handle(self) -> None:
+        request = json.loads(self.rfile.readline())
+        checker_path = find_checker(request['checker'])
+
+        try:
+            if request['command'] == 'supports':
+                self.send(supports=checker_path is not None and hasattr(load_checker(checker_path), 'check'))
+                return
+
+            if checker_path is None:
+                print(f'Unknown checker {request["checker"]!r} requested.', file=sys.stderr, flush=True)
+
+                for shard in request['shards']:
+                    self.send(shard=shard, results=None, events=[])
+
+                return
+
+            if not request['cache']:
+                os.environ[NO_CACHE_ENV] = '1'
+
+            shards = run_shards(checker_path, request['shards'], request['jobs'], request['profile'])
+
+            for shard, results in shards:
+                self.send(shard=shard, results=results, events=PROFILER.pop_events())
+        except BrokenPipeError:
+            pass  # the client stopped reading, for example because of --fail-fast
+
+    def send(self, **response: t.Any) -> None:
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+        self.wfile.flush()
+
+
+def serve(socket_path: str) -> None:
+    """Load all in-process checkers and serve checks on ``socket_path`` until interrupted."""
+    for checker_path in sorted(CHECKERS_DIR.glob('[!_]*.py')):
+        if hasattr(load_checker(checker_path), 'check'):
+            print(f'Loaded {checker_path.stem!r} checker.', file=sys.stderr, flush=True)
+
+    pathlib.Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        os.unlink(socket_path)
+    except FileNotFoundError:
+        pass
+
+    # Stop cleanly and remove the socket when terminated, too.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    with CheckerServer(socket_path, CheckerRequestHandler) as server:
+        print(f'Serving checks on {socket_path} ...', file=sys.stderr, flush=True)
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+
+
+def request_server(socket_path: str, **request: t.Any) -> t.Iterator[dict[str, t.Any]]:
+    """Send a request to the checker server and yield its responses."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+
+        with sock.makefile('rwb') as stream:
+            stream.write(json.dumps(request).encode() + b'\n')
+            stream.flush()
+
+            for line in stream:
+                yield json.loads(line)
+
+
+def server_supports(socket_path: str, name: str) -> bool:
+    """Return True if a checker server is listening on ``socket_path`` and can run the checker."""
+    if not os.path.exists(socket_path):
+        return False
+
+    try:
+        return any(response['supports'] for response in request_server(socket_path, command='supports', checker=name))
+    except OSError:
+        return False
+
+
+def run_streaming(
+    cmd: list[str],
+    fail_fast: int | None = None,
+    reporter: Reporter | None = None,
+    env: dict[str, str] | None = None,
+) -> bool:
+    """Run a checker subprocess, forwarding its output line by line and stopping it after ``fail_fast`` results."""
+    reporter = reporter or Reporter()
+    name = pathlib.Path(cmd[1]).stem
+    env = dict(env or os.environ, PYTHONUNBUFFERED='1', **{STREAM_ENV: '1'})
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+
+    def forward_stderr() -> None:
+        for line in process.stderr:
+            sys.stderr.write(line)
+            sys.stderr.flush()
+
+    stderr_thread = threading.Thread(target=forward_stderr, daemon=True)
+    stderr_thread.start()
+
+    count = 0
+
+    for line in process.stdout:
+        reporter.report_line(name, line.rstrip('\n'))
+        count += 1
+
+        if fail_fast and count >= fail_fast:
+            print(f'Stopping checker after {count} result(s).', file=sys.stderr, flush=True)
+            process.terminate()
+            break
+
+    process.stdout.close()
+    process.wait()
+    stderr_thread.join()
+
+    return bool(count) or process.returncode != 0
+
+
+def run_in_process(
+    checker_path: pathlib.Path,
+    paths: list[str],
+    options: RunOptions = RunOptions(),
+    cache: ResultCache | None = None,
+    index: FileIndex | None = None,
+    reporter: Reporter | None = None,
+    config_files: t.Sequence[str] = (),
+) -> bool:
+    """Run a checker's ``check`` function over shards of ``paths`` and print the merged results.
+
+    Cached results are keyed by the file, the files it includes and the nearest of the checker's ``config_files``.
+    """
+    reporter = reporter or Reporter()
+    name = checker_path.stem
+    results: list[dict[str, t.Any]] = []
+    errors = False
+    hashes: dict[str, str] = {}
+
+    if cache:
+        index = index or FileIndex(ROOT / 'docs')
+        hashes = {path: index.cache_key(path, config_files) for path in paths}
+        paths = [path for path in paths if not cache.replay(path, hashes[path], results)]
+        cached = len(hashes) - len(paths)
+
+        if cached:
+            print(f'Reusing cached results for {cached} of {len(hashes)} file(s).', file=sys.stderr, flush=True)
+
+    if options.fail_fast:
+        results = sorted(results, key=result_sort_key)[:options.fail_fast]
+
+        if len(results) >= options.fail_fast:
+            print(f'Stopping checker after {len(results)} result(s).', file=sys.stderr, flush=True)
+            paths = []
+
+    if options.stream:
+        # One file per shard, so results show up as soon as each file is done.
+        shards = split_shards(paths, len(paths))
+        reporter.report(name, results)
+    else:
+        shards = split_shards(paths, options.jobs * SHARDS_PER_JOB if options.jobs > 1 else 1)
+
+    if options.server:
+        shard_iterator = run_shards_on_server(options.server, checker_path, shards, options.jobs, options.profile)
+    else:
+        shard_iterator = run_shards(checker_path, shards, options.jobs, options.profile)
+
+    for shard, shard_results in shard_iterator:
+        if shard_results is None:
+            errors = True
+            continue
+
+        if cache:
+            cache.update({path: hashes[path] for path in shard}, shard_results)
+
+        if options.fail_fast:
+            shard_results = sorted(shard_results, key=result_sort_key)[:options.fail_fast - len(results)]
+
+        if options.stream:
+            reporter.report(name, shard_results)
+
+        results.extend(shard_results)
+
+        if options.fail_fast and len(results) >= options.fail_fast:
+            print(f'Stopping checker after {len(results)} result(s).', file=sys.stderr, flush=True)
+            break
+
+    if cache:
+        cache.save()
+
+    if not options.stream:
+        reporter.report(name, results)
+
+    return bool(results) or errors
+
+
+def run_shards(
+    checker_path: pathlib.Path,
+    shards: list[list[str]],
+    jobs: int,
+    profile: bool = False,
+) -> t.Iterator[tuple[list[str], list[dict[str, t.Any]] | None]]:
+    """Yield each shard with its results, or None if the checker raised, in the order the shards complete."""
+    if jobs == 1 or len(shards) <= 1:
+        for shard in shards:
+            try:
+                results, events = run_shard(str(checker_path), shard, profile)
+            except Exception:
+                traceback.print_exc()
+                yield shard, None
+                continue
+
+            PROFILER.events.extend(events)
+            yield shard, results
+
+        return
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+
+    try:
+        futures = {executor.submit(run_shard, str(checker_path), shard, profile): shard for shard in shards}
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results, events = future.result()
+            except Exception:
+                traceback.print_exc()
+                yield futures[future], None
+                continue
+
+            PROFILER.events.extend(events)
+            yield futures[future], results
+    finally:
+        # Shards that did not start yet are dropped when the caller stops early, e.g. for --fail-fast.
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def run_shards_on_server(
+    socket_path: str,
+    checker_path: pathlib.Path,
+    shards: list[list[str]],
+    jobs: int,
+    profile: bool = False,
+) -> t.Iterator[tuple[list[str], list[dict[str, t.Any]] | None]]:
+    """Like run_shards, but let the checker server do the work."""
+    if not shards:
+        return
+
+    responses = request_server(
+        socket_path, command='check', checker=checker_path.stem, shards=shards, jobs=jobs, profile=profile,
+        cache=caching_enabled(),
+    )
+
+    for response in responses:
+        if response['results'] is None:
+            print(f'The {checker_path.stem!r} checker failed on the checker server, see its output for details.', file=sys.stderr, flush=True)
+
+        PROFILER.events.extend(response['events'])
+        yield response['shard'], response['results']
+
+
+def run_shard(
+    checker_path: str,
+    paths: list[str],
+    profile: bool = False,
+) -> tuple[list[dict[str, t.Any]], list[dict[str, t.Any]]]:
+    """Check a shard, returning its results and the trace events recorded while checking it."""
+    PROFILER.enabled = profile
+    start = len(PROFILER.events)
+
+    with PROFILER.span('shard', files=len(paths)):
+        results = load_checker(pathlib.Path(checker_path)).check(paths)
+
+    events = PROFILER.events[start:]
+    del PROFILER.events[start:]
+
+    return results, events
+
+
+def split_shards(paths: list[str], count: int) -> list[list[str]]:
+    """Split ``paths`` into at most ``count`` non-empty shards of similar size."""
+    count = max(min(count, len(paths)), 1)
+
+    return [shard for shard in (paths[index::count] for index in range(count)) if shard]
+
+
+def result_sort_key(result: dict[str, t.Any]) -> tuple[str, int, int, str]:
+    return result['path'], _as_int(result['line']), _as_int(result['col']), result['message']
+
+
+def format_result(result: dict[str, t.Any]) -> str:
+    return '{path}:{line}:{col}: {message}'.format(**result)
+
+
+def parse_result_line(line: str) -> dict[str, t.Any]:
+    """Parse a ``path:line:col: [code: ]message`` line printed by a subprocess checker."""
+    match = RESULT_RE.match(line)
+
+    if not match:
+        return dict(path='', line=0, col=0, code='unknown', message=line)
+
+    result: dict[str, t.Any] = match.groupdict()
+    result['line'] = int(result['line'])
+    result['col'] = int(result['col'])
+
+    if code_match := CODE_RE.match(result['message']):
+        result['code'] = code_match.group('code')
+        result['severity'] = 'error' if result['code'] == 'error' else 'warning'
+        result['message'] = code_match.group('message')
+
+    return result
+
+
+class Reporter:
+    """Write checker results to stdout in one of the OUTPUT_FORMATS and count them per checker."""
+
+    def __init__(self, output_format: str = 'text') -> None:
+        self.output_format = output_format
+        self.counts: collections.Counter[tuple[str, str]] = collections.Counter()
+        self.sarif_runs: dict[str, list[dict[str, t.Any]]] = {}
+
+    def report(self, checker: str, results: list[dict[str, t.Any]]) -> None:
+        for result in sorted(results, key=result_sort_key):
+            self._report(checker, result, format_result(result))
+
+        sys.stdout.flush()
+
+    def report_line(self, checker: str, line: str) -> None:
+        """Report a line of text output, which is kept verbatim in text format."""
+        self._report(checker, parse_result_line(line), line)
+        sys.stdout.flush()
+
+    def _report(self, checker: str, result: dict[str, t.Any], text: str) -> None:
+        record = make_record(checker, result)
+        self.counts[checker, record['code'] or record['severity']] += 1
+
+        if self.output_format == 'text':
+            print(text)
+        elif self.output_format == 'jsonl':
+            print(json.dumps(record, sort_keys=True))
+        else:
+            self.sarif_runs.setdefault(checker, []).append(record)
+
+    def summarize(self, checker: str) -> None:
+        """Print the number of results per code of a checker to stderr."""
+        counts = {code: count for (name, code), count in self.counts.items() if name == checker}
+
+        if counts:
+            details = ', '.join(f'{code}: {count}' for code, count in sorted(counts.items()))
+            print(f'{checker!r} checker reported {sum(counts.values())} result(s) ({details})', file=sys.stderr, flush=True)
+
+    def close(self) -> None:
+        if self.output_format == 'sarif':
+            json.dump(make_sarif_log(self.sarif_runs), sys.stdout, indent=2)
+            print()
+
+
+def make_record(checker: str, result: dict[str, t.Any]) -> dict[str, t.Any]:
+    path = result['path']
+
+    if path and os.path.isabs(path) and os.path.normpath(path).startswith(str(ROOT) + os.path.sep):
+        path = os.path.relpath(path, ROOT)
+
+    return dict(
+        checker=checker,
+        path=path,
+        line=_as_int(result['line']),
+        col=_as_int(result['col']),
+        severity=result.get('severity') or 'error',
+        code=result.get('code'),
+        message=result['message'],
+    )
+
+
+def make_sarif_log(runs: dict[str, list[dict[str, t.Any]]]) -> dict[str, t.Any]:
+    sarif_runs = []
+
+    for checker, records in runs.items():
+        rule_ids = sorted({record['code'] or checker for record in records})
+        sarif_runs.append(dict(
+            tool=dict(driver=dict(name=checker, rules=[dict(id=rule_id) for rule_id in rule_ids])),
+            results=[
+                dict(
+                    ruleId=record['code'] or checker,
+                    level=SARIF_LEVELS.get(record['severity'], 'error'),
+                    message=dict(text=record['message']),
+                    locations=[dict(physicalLocation=dict(
+                        artifactLocation=dict(uri=record['path']),
+                        region=dict(startLine=max(record['line'], 1), startColumn=max(record['col'], 1)),
+                    ))],
+                )
+                for record in records
+            ],
+        ))
+
+    return {
+        '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+        'version': '2.1.0',
+        'runs': sarif_runs,
+    }
+
+
+def checker_digest(checker_path: pathlib.Path, config: dict[str, t.Any]) -> str:
+    """Hash everything besides the checked file that can change a checker's results."""
+    digest = hashlib.sha256()
+    digest.update(checker_path.read_bytes())
+    digest.update(json.dumps(config, sort_keys=True).encode())
+
+    for cache_input in config.get('cache_inputs', []):
+        digest.update(cache_input.encode())
+        digest.update((ROOT / cache_input).read_bytes())
+
+    return digest.hexdigest()
+
+
+class FileIndex:
+    """All files below a directory, walked once and read at most once per session."""
+
+    def __init__(self, directory: pathlib.Path) -> None:
+        self.directory = directory
+        self.paths: list[str] = []
+        self._contents: dict[str, bytes] = {}
+        self._hashes: dict[str, str] = {}
+        self._includes: dict[str, list[str]] = {}
+        self._config_files: dict[tuple[str, tuple[str, ...]], str | None] = {}
+        self._walk()
+
+    def _walk(self) -> None:
+        self.paths = []
+
+        for root, dir_names, file_names in os.walk(self.directory):
+            dir_names.sort()
+
+            for file_name in sorted(file_names):
+                self.paths.append(os.path.join(root, file_name))
+
+    def refresh(self, changed: t.Iterable[str]) -> None:
+        """Forget what is known about the changed paths and pick up added or removed files."""
+        self._walk()
+
+        for path in changed:
+            self._contents.pop(path, None)
+            self._includes.pop(path, None)
+
+        # Hashes cover included files, so any change can invalidate the hash of another file.
+        self._hashes.clear()
+        self._config_files.clear()
+
+    def select(self, extensions: t.Iterable[str], ignore_regexs: t.Iterable[str]) -> list[str]:
+        """Return the paths with one of the given extensions that match none of the ignore regexs (relative to ROOT)."""
+        extensions = set(extensions)
+        patterns = [re.compile(regex) for regex in ignore_regexs]
+        paths = []
+
+        for path in self.paths:
+            if os.path.splitext(path)[1] not in extensions:
+                continue
+
+            rel_path = os.path.relpath(path, ROOT)
+            if any(pattern.match(rel_path) for pattern in patterns):
+                continue
+
+            paths.append(path)
+
+        return paths
+
+    def read(self, path: str) -> bytes:
+        if path not in self._contents:
+            with open(path, 'rb') as file:
+                self._contents[path] = file.read()
+
+        return self._contents[path]
+
+    def includes(self, path: str) -> list[str]:
+        """Return the normalized paths of the files included by the ``include`` and ``literalinclude`` directives."""
+        if path not in self._includes:
+            includes = []
+
+            for match in INCLUDE_RE.finditer(self.read(path).decode('utf-8', errors='replace')):
+                target = match.group('target')
+
+                if target.startswith('/'):
+                    include = DOCS_SOURCE_DIR / target.lstrip('/')  # Sphinx resolves absolute paths relative to the source dir
+                else:
+                    include = pathlib.Path(path).parent / target
+
+                includes.append(os.path.normpath(include))
+
+            self._includes[path] = includes
+
+        return self._includes[path]
+
+    def hash(self, path: str, seen: frozenset[str] = frozenset()) -> str:
+        """Hash the content of ``path`` together with the content of the files it includes."""
+        if path not in self._hashes:
+            digest = hashlib.sha256(self.read(path))
+            seen |= {path}
+
+            for include in self.includes(path):
+                if include not in seen and os.path.isfile(include):
+                    digest.update(self.hash(include, seen).encode())
+
+            self._hashes[path] = digest.hexdigest()
+
+        return self._hashes[path]
+
+    def config_file(self, path: str, names: t.Sequence[str]) -> str | None:
+        """Return the nearest file named one of ``names`` in the directory of ``path`` or its parents, like rstcheck."""
+        return self._find_config_file(os.path.dirname(os.path.realpath(path)), tuple(names))
+
+    def _find_config_file(self, directory: str, names: tuple[str, ...]) -> str | None:
+        key = directory, names
+
+        if key not in self._config_files:
+            candidates = [os.path.join(directory, name) for name in names]
+            found = next((candidate for candidate in candidates if os.path.exists(candidate)), None)
+            parent = os.path.dirname(directory)
+
+            if found is None and parent != directory:
+                found = self._find_config_file(parent, names)
+
+            self._config_files[key] = found
+
+        return self._config_files[key]
+
+    def cache_key(self, path: str, config_files: t.Sequence[str] = ()) -> str:
+        """Return the hash of ``path``, combined with the nearest of ``config_files`` that apply to it, if any."""
+        config_file = self.config_file(path, config_files) if config_files else None
+
+        if config_file is None:
+            return self.hash(path)
+
+        digest = hashlib.sha256(self.hash(path).encode())
+        digest.update(config_file.encode())
+        digest.update(self.read(config_file))
+
+        return digest.hexdigest()
+
+
+def get_changed_files(ref: str) -> set[str]:
+    """Return the files changed since ``ref``, including uncommitted and untracked files."""
+    cmds = [
+        ['git', 'diff', '--name-only', '--no-renames', ref, '--'],
+        ['git', 'ls-files', '--others', '--exclude-standard'],
+    ]
+
+    changed = set()
+
+    for cmd in cmds:
+        try:
+            result = subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as ex:
+            sys.exit(f'{ex}\n{ex.stderr.strip()}')
+
+        changed.update(os.path.normpath(ROOT / name) for name in result.stdout.splitlines())
+
+    return changed
+
+
+def changed_checker_inputs(checker_path: pathlib.Path, config: dict[str, t.Any], changed: set[str]) -> bool:
+    """Return True if a change can affect the results of every file, in which case all files must be checked."""
+    inputs = [checker_path, checker_path.with_suffix('.json'), pathlib.Path(__file__)]
+    inputs.extend(ROOT / cache_input for cache_input in config.get('cache_inputs', []))
+
+    return any(os.path.normpath(path) in changed for path in inputs)
+
+
+def select_affected(paths: list[str], changed: set[str], index: FileIndex, config_files: t.Sequence[str] = ()) -> list[str]:
+    """Return the ``paths`` that changed or that include a changed file, directly or indirectly.
+
+    A changed file named like one of ``config_files`` affects all ``paths`` in its directory and below.
+    """
+    included_by = collections.defaultdict(set)
+    config_dirs = [os.path.dirname(path) + os.path.sep for path in changed if os.path.basename(path) in config_files]
+
+    for path in paths:
+        for include in index.includes(path):
+            included_by[include].add(path)
+
+    affected = set()
+    pending = list(changed)
+    pending.extend(path for path in paths if path.startswith(tuple(config_dirs)))
+
+    while pending:
+        path = pending.pop()
+
+        if path in affected:
+            continue
+
+        affected.add(path)
+        pending.extend(included_by.get(path, ()))
+
+    return [path for path in paths if path in affected]
+
+
+class ResultCache:
+    """Per-file checker results keyed by the file's content hash and the checker's digest."""
+
+    def __init__(self, path: pathlib.Path, digest: str, files: dict[str, dict[str, t.Any]]) -> None:
+        self.path = path
+        self.digest = digest
+        self.files = files
+
+    @classmethod
+    def load(cls, name: str, digest: str) -> ResultCache:
+        path = CACHE_DIR / f'{name}.json'
+
+        try:
+            data = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            data = {}
+
+        if data.get('version') != CACHE_VERSION or data.get('digest') != digest:
+            data = {}
+
+        return cls(path, digest, data.get('files', {}))
+
+    def replay(self, path: str, file_hash: str, results: list[dict[str, t.Any]]) -> bool:
+        """Append the cached results for ``path`` to ``results`` and return True if they are still valid."""
+        entry = self.files.get(os.path.relpath(path, ROOT))
+
+        if not entry or entry['hash'] != file_hash:
+            return False
+
+        results.extend(dict(result, path=path) for result in entry['results'])
+
+        return True
+
+    def update(self, hashes: dict[str, str], results: list[dict[str, t.Any]]) -> None:
+        """Store ``results`` for the freshly checked files in ``hashes``."""
+        per_file: dict[str, list[dict[str, t.Any]]] = {path: [] for path in hashes}
+
+        for result in results:
+            if result['path'] not in per_file:
+                # The result cannot be attributed to a single checked file, so nothing from this run is cached.
+                return
+
+            per_file[result['path']].append(result)
+
+        for path, file_results in per_file.items():
+            self.files[os.path.relpath(path, ROOT)] = dict(
+                hash=hashes[path],
+                results=[dict(result, path=None) for result in file_results],
+            )
+
+    def save(self) -> None:
+        self.files = {rel_path: entry for rel_path, entry in self.files.items() if (ROOT / rel_path).exists()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(dict(version=CACHE_VERSION, digest=self.digest, files=self.files)))
+        tmp_path.replace(self.path)
+
+
+def _as_int(value: t.Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
 if __name__ == '__main__':
     main()
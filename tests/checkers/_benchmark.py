@@ -0,0 +1,108 @@
+"""History of benchmark runs, shared by tests/checkers_benchmark.py and docs/docsite/build_benchmark.py.
+
+Each run is appended to a JSON Lines file as a record with the results of its targets,
+each with its wall time in ``seconds``, and is compared with the last comparable run.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import typing as t
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+
+# Bump when the layout of the records changes, so runs are only compared with runs of the same layout.
+HISTORY_FORMAT = 1
+
+
+def make_record(
+    results: dict[str, dict[str, t.Any]], **fields: t.Any
+) -> dict[str, t.Any]:
+    """Return the record of a run of this machine and commit. ``fields`` describe what was run."""
+    return dict(
+        format=HISTORY_FORMAT,
+        timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat(
+            timespec="seconds"
+        ),
+        commit=git_commit(),
+        python=platform.python_version(),
+        cpus=os.cpu_count(),
+        **fields,
+        results=results,
+    )
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return result.stdout.strip()
+
+
+def find_previous(
+    history: pathlib.Path, record: dict[str, t.Any], keys: t.Iterable[str]
+) -> dict[str, t.Any] | None:
+    """Return the last run in the history with the same machine shape and ``keys`` as ``record``, if any."""
+    keys = ("format", "cpus", *keys)
+    previous = None
+
+    try:
+        with open(history, encoding="utf-8") as history_file:
+            for line in history_file:
+                candidate = json.loads(line)
+
+                if all(candidate.get(key) == record[key] for key in keys):
+                    previous = candidate
+    except FileNotFoundError:
+        pass
+
+    return previous
+
+
+def compare(
+    previous: dict[str, t.Any], record: dict[str, t.Any], max_regression: float | None
+) -> list[str]:
+    """Print the change against ``previous`` and return the targets that regressed more than ``max_regression``."""
+    print(
+        f'Compared to {previous["commit"]} ({previous["timestamp"]}):', file=sys.stderr
+    )
+    regressions = []
+
+    for target, result in record["results"].items():
+        if target not in previous["results"]:
+            continue
+
+        before = previous["results"][target]["seconds"]
+        change = (result["seconds"] - before) / before * 100 if before else 0.0
+        print(
+            f'  {target}: {before:.2f} s -> {result["seconds"]:.2f} s ({change:+.1f}%)',
+            file=sys.stderr,
+        )
+
+        if max_regression is not None and change > max_regression:
+            regressions.append(target)
+
+    sys.stderr.flush()
+
+    return regressions
+
+
+def append_record(history: pathlib.Path, record: dict[str, t.Any]) -> None:
+    history.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(history, "a", encoding="utf-8") as history_file:
+        history_file.write(json.dumps(record, sort_keys=True) + "\n")
@@ -0,0 +1,317 @@
+"""Persistent caches the checkers keep between runs."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import typing as t
+
+CACHE_DIR = (
+    pathlib.Path(__file__).resolve().parent.parent.parent / ".cache" / "checkers"
+)
+
+# Set to 1 to neither read nor update the caches, as the checker runner does with --no-cache.
+NO_CACHE_ENV = "CHECKERS_NO_CACHE"
+
+# Number of worker processes of a checker run directly, defaults to the number of CPUs.
+# The checker runner imports the checkers' check() and does its own sharding instead.
+JOBS_ENV = "CHECKERS_JOBS"
+
+# Set to 1 by the checker runner for the checkers it runs as subprocesses. The runner summarizes
+# their results itself, so they leave out their own summaries.
+RUNNER_ENV = "CHECKERS_RUNNER"
+
+# Set to 1 to let checkers that build the docs keep their build between runs, as the checker
+# runner does with --incremental. Ignored when caching is disabled.
+INCREMENTAL_ENV = "CHECKERS_INCREMENTAL"
+
+# Set to 1 by the checker runner when it forwards a checker's output line by line, so checkers
+# can show the output of long commands as progress instead of only on failure.
+STREAM_ENV = "CHECKERS_STREAM"
+
+# A problem found in a snippet: line, column, level, description and rule, relative to the snippet.
+SnippetProblem = tuple[int, int, str, str, t.Optional[str]]
+
+# Path, mtime in nanoseconds and size of a file a document was parsed from.
+FileStamp = tuple[str, int, int]
+
+
+def caching_enabled() -> bool:
+    return os.environ.get(NO_CACHE_ENV) != "1"
+
+
+def get_jobs() -> int:
+    """Return the number of worker processes a checker run directly should use."""
+    return int(os.environ.get(JOBS_ENV) or os.cpu_count() or 1)
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """Open the cache database ``name``, which several checker processes can use at once."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(CACHE_DIR / f"{name}.sqlite", timeout=60)
+    connection.execute("PRAGMA journal_mode = WAL")
+    return connection
+
+
+def stamp(path: str) -> FileStamp:
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+class SnippetCache:
+    """Problems found in code snippets, keyed by the snippet and a digest of the linter configuration.
+
+    The docs repeat the same snippets many times, and most snippets do not change between
+    runs, so each distinct snippet only needs to be linted once. Problems are stored relative
+    to the snippet, callers add the offset of the block they were found in.
+    """
+
+    def __init__(
+        self, connection: sqlite3.Connection | None, config_digest: str
+    ) -> None:
+        self.connection = connection
+        self.config_digest = config_digest
+        self.problems: dict[str, list[SnippetProblem]] = {}
+        self.added: dict[str, list[SnippetProblem]] = {}
+
+    @classmethod
+    def open(cls, config_digest: str) -> SnippetCache:
+        """Open the persistent cache, or an in-memory one for this run if caching is disabled."""
+        if not caching_enabled():
+            return cls(None, config_digest)
+
+        connection = connect("snippets")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS snippets (key TEXT PRIMARY KEY, problems TEXT NOT NULL)"
+        )
+
+        return cls(connection, config_digest)
+
+    def key(self, content: str, variant: str = "") -> str:
+        """Return the key of a snippet. ``variant`` covers settings that depend on the file the snippet is in."""
+        data = "\0".join((self.config_digest, variant, content.replace("\r\n", "\n")))
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> list[SnippetProblem] | None:
+        if key in self.problems:
+            return self.problems[key]
+
+        if self.connection is None:
+            return None
+
+        row = self.connection.execute(
+            "SELECT problems FROM snippets WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        problems = self.problems[key] = [tuple(problem) for problem in json.loads(row[0])]  # type: ignore[misc]
+
+        return problems
+
+    def add(self, key: str, problems: list[SnippetProblem]) -> None:
+        self.problems[key] = problems
+        self.added[key] = problems
+
+    def close(self) -> None:
+        """Store the snippets added in this run."""
+        if self.connection is None:
+            return
+
+        try:
+            if self.added:
+                with self.connection:
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO snippets VALUES (?, ?)",
+                        [
+                            (key, json.dumps(problems))
+                            for key, problems in self.added.items()
+                        ],
+                    )
+        finally:
+            self.connection.close()
+            self.connection = None
+
+
+class CodeBlock(t.NamedTuple):
+    """The parts of a code block found by antsibull_docutils' find_code_blocks the checkers use."""
+
+    language: str | None
+    row_offset: int
+    col_offset: int
+    content: str
+
+
+class LiteralInclude(t.NamedTuple):
+    """A literalinclude directive, which docutils does not know, so find_code_blocks does not see it."""
+
+    line: int
+    col: int
+    target: str
+    options: dict[str, str]
+
+
+class IndexedDocument(t.NamedTuple):
+    blocks: list[CodeBlock]
+    # Arguments of the calls find_code_blocks made to its unknown literal block callback.
+    warnings: list[list[t.Any]]
+    literal_includes: list[LiteralInclude]
+
+
+class CodeBlockIndex:
+    """The code blocks of rst documents, so only documents that changed need to be parsed again.
+
+    Documents are found by the mtimes and sizes of their files, that is the document and the
+    files it includes, or if those changed, by a digest of the files' contents. Entries made
+    by another version of the parser are ignored.
+    """
+
+    # Bump when the tables change.
+    SCHEMA_VERSION = 2
+
+    def __init__(
+        self, connection: sqlite3.Connection | None, parser_version: str
+    ) -> None:
+        self.connection = connection
+        self.parser_version = parser_version
+        self.added: dict[str, tuple[list[FileStamp], str, IndexedDocument]] = {}
+
+    @classmethod
+    def open(cls, parser_version: str) -> CodeBlockIndex:
+        """Open the persistent index, or an empty one if caching is disabled."""
+        if not caching_enabled():
+            return cls(None, parser_version)
+
+        connection = connect("code-blocks")
+
+        if (
+            connection.execute("PRAGMA user_version").fetchone()[0]
+            != cls.SCHEMA_VERSION
+        ):
+            connection.executescript(
+                f"""
+                DROP TABLE IF EXISTS documents;
+                DROP TABLE IF EXISTS blocks;
+                PRAGMA user_version = {cls.SCHEMA_VERSION};
+                """
+            )
+
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                files TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                warnings TEXT NOT NULL,
+                literal_includes TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blocks (
+                path TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                language TEXT,
+                row_offset INTEGER NOT NULL,
+                col_offset INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (path, position)
+            );
+            """
+        )
+
+        return cls(connection, parser_version)
+
+    def get(self, path: str, digest: str | None = None) -> IndexedDocument | None:
+        """Return the indexed code blocks of a document if none of its files changed.
+
+        Without ``digest``, the mtimes and sizes of the files are compared, otherwise the
+        digest of their contents.
+        """
+        if self.connection is None:
+            return None
+
+        row = self.connection.execute(
+            "SELECT files, digest, warnings, literal_includes FROM documents WHERE path = ? AND version = ?",
+            (path, self.parser_version),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        files, stored_digest, warnings, literal_includes = row
+
+        if digest is None:
+            try:
+                if any(stamp(file[0]) != tuple(file) for file in json.loads(files)):
+                    return None
+            except OSError:
+                return None
+        elif digest != stored_digest:
+            return None
+
+        blocks = [
+            CodeBlock(*block)
+            for block in self.connection.execute(
+                "SELECT language, row_offset, col_offset, content FROM blocks WHERE path = ? ORDER BY position",
+                (path,),
+            )
+        ]
+
+        return IndexedDocument(
+            blocks,
+            json.loads(warnings),
+            [LiteralInclude(*include) for include in json.loads(literal_includes)],
+        )
+
+    def add(
+        self, path: str, files: list[FileStamp], digest: str, document: IndexedDocument
+    ) -> None:
+        """Index a document. ``files`` are the stamps of its files, taken before reading them."""
+        self.added[path] = files, digest, document
+
+    def close(self) -> None:
+        """Store the documents indexed in this run."""
+        if self.connection is None:
+            return
+
+        try:
+            with self.connection:
+                for path, (files, digest, document) in self.added.items():
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            path,
+                            self.parser_version,
+                            json.dumps(files),
+                            digest,
+                            json.dumps(document.warnings),
+                            json.dumps(document.literal_includes),
+                        ),
+                    )
+                    self.connection.execute(
+                        "DELETE FROM blocks WHERE path = ?", (path,)
+                    )
+                    self.connection.executemany(
+                        "INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                path,
+                                position,
+                                block.language,
+                                block.row_offset,
+                                block.col_offset,
+                                hashlib.sha256(
+                                    block.content.encode("utf-8")
+                                ).hexdigest(),
+                                block.content,
+                            )
+                            for position, block in enumerate(document.blocks)
+                        ],
+                    )
+        finally:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,13 @@
+"""The docs build in docs/docsite, shared by the docs-build checker and docs/docsite/build_benchmark.py."""
+
+from __future__ import annotations
+
+# Makefile variables of the commands generating rst. Set to a no-op (``:``), make builds the
+# docs from the rst generated before, so the generation and the Sphinx build can be run apart.
+GENERATOR_VARIABLES = (
+    "COLLECTION_DUMPER",
+    "CONFIG_DUMPER",
+    "GENERATE_CLI",
+    "KEYWORD_DUMPER",
+    "PLUGIN_FORMATTER",
+)
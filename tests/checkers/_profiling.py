@@ -0,0 +1,106 @@
+"""Opt-in timing of checker phases, recorded as Chrome trace events."""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+import typing as t
+
+# Set to the path of a trace file to profile a checker that is run directly.
+PROFILE_ENV = "CHECKERS_PROFILE"
+# Set to 0 to only write the trace file, as the checker runner does.
+REPORT_ENV = "CHECKERS_PROFILE_REPORT"
+
+# Name of the span that covers all work done for one file.
+FILE_SPAN = "file"
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.events: list[dict[str, t.Any]] = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args: t.Any) -> t.Iterator[None]:
+        """Record the wall time of the enclosed block as a complete trace event."""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter_ns()
+
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start / 1000,
+                    "dur": (end - start) / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_native_id(),
+                    "args": args,
+                }
+            )
+
+    def pop_events(self) -> list[dict[str, t.Any]]:
+        events, self.events = self.events, []
+        return events
+
+
+PROFILER = Profiler(bool(os.environ.get(PROFILE_ENV)))
+
+
+def write_trace(events: list[dict[str, t.Any]], path: str | os.PathLike[str]) -> None:
+    """Write the events as a trace file that chrome://tracing and Perfetto can load."""
+    pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def print_report(events: list[dict[str, t.Any]], top: int = 20) -> None:
+    """Print the total time per phase and the slowest files to stderr."""
+    phases: collections.Counter[str] = collections.Counter()
+    files: collections.Counter[str] = collections.Counter()
+
+    for event in events:
+        phases[event["name"]] += event["dur"]
+
+        if event["name"] == FILE_SPAN:
+            files[event["args"]["path"]] += event["dur"]
+
+    print("Time per phase:", file=sys.stderr)
+
+    for name, duration in phases.most_common():
+        print(f"  {duration / 1000:10.1f} ms  {name}", file=sys.stderr)
+
+    if files:
+        print(
+            f"Slowest {min(top, len(files))} of {len(files)} file(s):", file=sys.stderr
+        )
+
+        for path, duration in files.most_common(top):
+            print(f"  {duration / 1000:10.1f} ms  {path}", file=sys.stderr)
+
+    sys.stderr.flush()
+
+
+def finish() -> None:
+    """Write the trace and print the report of a checker run directly with CHECKERS_PROFILE set."""
+    if not PROFILER.enabled:
+        return
+
+    events = PROFILER.pop_events()
+    write_trace(events, os.environ[PROFILE_ENV])
+
+    if os.environ.get(REPORT_ENV) != "0":
+        print_report(events)
@@ -1,139 +1,460 @@
 from __future__ import annotations
 
+import collections
+import hashlib
+import json
 import os
 import re
 import shutil
+import stat
 import subprocess
 import sys
 import tempfile
 
+from _cache import CACHE_DIR, INCREMENTAL_ENV, RUNNER_ENV, STREAM_ENV, caching_enabled
+from _docsite import GENERATOR_VARIABLES
+from _profiling import PROFILER, finish
+
+# Copy of the docs, with links to the other inputs, kept between incremental runs. The Sphinx build and
+# environment are in its docs/docsite/_build.
+BUILD_DIR = CACHE_DIR / 'docs-build'
+
+# Files synced into BUILD_DIR by the last incremental run, and the rst files generated in it, by path.
+SOURCES_MANIFEST = '.sources.json'
+GENERATED_MANIFEST = '.generated.json'
+
+# Build output in the source tree, which is not synced so it cannot replace the kept build.
+SYNC_EXCLUDES = {
+    'docs/docsite/_build',
+    'docs/docsite/rst_warnings',
+}
+
+WARNING_RE = re.compile(r'^(?P<path>[^:]+):((?P<line>[0-9]+):)?((?P<column>[0-9]+):)? (?P<level>WARNING|ERROR): (?P<message>.*)$')
+
+KNOWN_WARNINGS = {
+    'block-quote-missing-blank-line': r'^Block quote ends without a blank line; unexpected unindent.$',
+    'literal-block-lex-error': r'^Could not lex literal_block as "[^"]*". Highlighting skipped.$',
+    'duplicate-label': r'^duplicate label ',
+    'undefined-label': r'undefined label: ',
+    'unknown-document': r'unknown document: ',
+    'toc-tree-missing-document': r'toctree contains reference to nonexisting document ',
+    'reference-target-not-found': r'[^ ]* reference target not found: ',
+    'not-in-toc-tree': r"document isn't included in any toctree$",
+    'unexpected-indentation': r'^Unexpected indentation.$',
+    'definition-list-missing-blank-line': r'^Definition list ends without a blank line; unexpected unindent.$',
+    'explicit-markup-missing-blank-line': r'Explicit markup ends without a blank line; unexpected unindent.$',
+    'toc-tree-glob-pattern-no-match': r"^toctree glob pattern '[^']*' didn't match any documents$",
+    'unknown-interpreted-text-role': '^Unknown interpreted text role "[^"]*".$',
+}
+
+# Codes of KNOWN_WARNINGS by the names of their groups in KNOWN_WARNING_RE.
+KNOWN_WARNING_GROUPS = {code.replace('-', '_'): code for code in KNOWN_WARNINGS}
+
+# All KNOWN_WARNINGS in one pattern, matched once per message.
+KNOWN_WARNING_RE = re.compile('^(?:' + '|'.join(
+    '(?s:.*?)(?P<%s>%s)' % (group, KNOWN_WARNINGS[code]) for group, code in KNOWN_WARNING_GROUPS.items()
+) + ')')
+
+# Width of the longest bar in the summary of the warnings by code.
+HISTOGRAM_WIDTH = 40
+
+# Known warnings, one per line with the path, code and normalized message separated by tabs. When the file exists,
+# only warnings missing from it are reported, and entries of it the build no longer warns about.
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs-build-baseline.txt')
+
+# Set to 1 to write the warnings of a full build to the baseline file instead of reporting them.
+UPDATE_BASELINE_ENV = 'CHECKERS_UPDATE_BASELINE'
+
 
 def main():
     base_dir = os.getcwd()
 
-    keep_dirs = [
+    # Inputs the build only reads, which are symlinked instead of copied.
+    link_paths = [
         'bin',
-        'docs',
         'examples',
         'hacking',
         'lib',
         'packaging',
         'test/lib',
-    ]
-
-    keep_files = [
         'MANIFEST.in',
         'pyproject.toml',
         'requirements.txt',
     ]
 
+    # Directories the build writes to, with the generated rst and the Sphinx build in docs/docsite.
+    copy_dirs = [
+        'docs',
+    ]
+
     # The tests write to the source tree, which isn't permitted for sanity tests.
-    # To work around this a temporary copy is used.
+    # To work around this a temporary copy of the docs is used, with links to the other inputs, or with
+    # CHECKERS_INCREMENTAL a persistent one, in which Sphinx only reads the documents that changed since the last run.
 
-    current_dir = os.getcwd()
+    if os.environ.get(INCREMENTAL_ENV) == '1' and caching_enabled():
+        if os.environ.get(UPDATE_BASELINE_ENV) == '1':
+            sys.exit('The baseline can only be updated by a full build, not with %s.' % INCREMENTAL_ENV)
+
+        with PROFILER.span('sync'):
+            sources = sync_tree(base_dir, str(BUILD_DIR), copy_dirs, [])
+            link_inputs(base_dir, str(BUILD_DIR), link_paths)
+
+        use_copy(str(BUILD_DIR), base_dir)
+
+        try:
+            run_test(sources)
+        finally:
+            finish()
+
+        return
 
     with tempfile.TemporaryDirectory(prefix='docs-build-', suffix='-sanity') as temp_dir:
-        for keep_dir in keep_dirs:
-            shutil.copytree(os.path.join(base_dir, keep_dir), os.path.join(temp_dir, keep_dir), symlinks=True)
+        with PROFILER.span('copy'):
+            for copy_dir in copy_dirs:
+                shutil.copytree(os.path.join(base_dir, copy_dir), os.path.join(temp_dir, copy_dir), symlinks=True)
+
+            link_inputs(base_dir, temp_dir, link_paths)
+
+        use_copy(temp_dir, base_dir)
+
+        try:
+            run_test()
+        finally:
+            finish()
+
+
+def link_inputs(source_dir, target_dir, paths):
+    """Symlink paths of source_dir into target_dir, replacing what is there unless it already links to them."""
+    for path in paths:
+        source = os.path.join(source_dir, path)
+        target = os.path.join(target_dir, path)
+
+        if os.path.islink(target) and os.readlink(target) == source:
+            continue
+
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.rmtree(target)
+        elif os.path.lexists(target):
+            os.remove(target)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.symlink(source, target)
+
+
+def use_copy(copy_dir, base_dir):
+    """Fix up the environment so everything runs from the copy."""
+    paths = os.environ['PATH'].split(os.pathsep)
+    paths = [f'{copy_dir}/bin' if path == f'{base_dir}/bin' else path for path in paths]
+
+    os.environ['PATH'] = os.pathsep.join(paths)
+    os.environ['PYTHONPATH'] = f'{copy_dir}/lib'
+    # Python would otherwise write bytecode next to the linked sources, in the source tree.
+    os.environ['PYTHONPYCACHEPREFIX'] = f'{copy_dir}/.pycache'
+    os.chdir(copy_dir)
+
+
+def sync_tree(source_dir, target_dir, keep_dirs, keep_files):
+    """Update the copy in target_dir, copying only the files that changed since the last sync, and return their paths.
+
+    Files are compared by mtime and size, which shutil.copy2 preserves, so Sphinx sees the same mtimes as in the
+    source tree. Files removed from the source tree since the last sync are removed from the copy, other files in
+    the copy, such as generated rst and the build, are left alone.
+    """
+    manifest_path = os.path.join(target_dir, SOURCES_MANIFEST)
+
+    try:
+        with open(manifest_path) as manifest_fd:
+            previous = json.load(manifest_fd)
+    except (OSError, ValueError):
+        previous = {}
+
+    current = {}
+
+    for path in iter_sources(source_dir, keep_dirs, keep_files):
+        source = os.path.join(source_dir, path)
+        target = os.path.join(target_dir, path)
+        info = os.lstat(source)
+
+        if stat.S_ISLNK(info.st_mode):
+            current[path] = ['link', os.readlink(source)]
+        else:
+            current[path] = [info.st_mtime_ns, info.st_size]
+
+        if current[path] == previous.get(path) and os.path.lexists(target):
+            continue
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        if os.path.lexists(target) and (os.path.islink(target) or not os.path.isdir(target)):
+            os.remove(target)
+
+        if stat.S_ISLNK(info.st_mode):
+            os.symlink(os.readlink(source), target)
+        else:
+            shutil.copy2(source, target)
+
+    for path in previous.keys() - current.keys():
+        target = os.path.join(target_dir, path)
+
+        # Never follow a symlink to the source tree, such as a linked input that used to be copied.
+        parent_dir = os.path.normpath(os.path.join(os.path.realpath(target_dir), os.path.dirname(path)))
+
+        if os.path.realpath(os.path.dirname(target)) != parent_dir:
+            continue
+
+        if os.path.lexists(target) and (os.path.islink(target) or not os.path.isdir(target)):
+            os.remove(target)
+
+    with open(manifest_path, 'w') as manifest_fd:
+        json.dump(current, manifest_fd)
+
+    return set(current)
+
+
+def iter_sources(source_dir, keep_dirs, keep_files):
+    """Yield the paths of the files and symlinks to copy, relative to source_dir."""
+    for keep_dir in keep_dirs:
+        for root, dir_names, file_names in os.walk(os.path.join(source_dir, keep_dir)):
+            rel_root = os.path.relpath(root, source_dir)
+
+            # Symlinks to directories are listed with the directories, but copied as symlinks.
+            for name in list(dir_names):
+                if os.path.join(rel_root, name) in SYNC_EXCLUDES:
+                    dir_names.remove(name)
+                elif os.path.islink(os.path.join(root, name)):
+                    yield os.path.join(rel_root, name)
+
+            for name in file_names:
+                if os.path.join(rel_root, name) not in SYNC_EXCLUDES:
+                    yield os.path.join(rel_root, name)
+
+    yield from keep_files
+
+
+def keep_generated_mtimes(rst_dir, sources):
+    """Give the generated rst files that did not change the mtimes they had after the last run.
+
+    The generators rewrite all their files, and Sphinx would read every one of them again otherwise.
+    """
+    try:
+        with open(GENERATED_MANIFEST) as manifest_fd:
+            previous = json.load(manifest_fd)
+    except (OSError, ValueError):
+        previous = {}
+
+    current = {}
+
+    for root, _dir_names, file_names in os.walk(rst_dir):
+        for name in file_names:
+            path = os.path.join(root, name)
+
+            # Symlinks, such as the index created by core_structure, point to synced files, which keep their mtimes.
+            if path in sources or os.path.islink(path):
+                continue
+
+            with open(path, 'rb') as generated_fd:
+                digest = hashlib.sha256(generated_fd.read()).hexdigest()
 
-        for keep_file in keep_files:
-            shutil.copy2(os.path.join(base_dir, keep_file), os.path.join(temp_dir, keep_file))
+            mtime = os.stat(path).st_mtime_ns
 
-        paths = os.environ['PATH'].split(os.pathsep)
-        paths = [f'{temp_dir}/bin' if path == f'{current_dir}/bin' else path for path in paths]
+            if path in previous and previous[path][0] == digest:
+                mtime = previous[path][1]
+                os.utime(path, ns=(mtime, mtime))
 
-        # Fix up the environment so everything runs from the temporary copy.
-        os.environ['PATH'] = os.pathsep.join(paths)
-        os.environ['PYTHONPATH'] = f'{temp_dir}/lib'
-        os.chdir(temp_dir)
+            current[path] = [digest, mtime]
 
-        run_test()
+    with open(GENERATED_MANIFEST, 'w') as manifest_fd:
+        json.dump(current, manifest_fd)
 
 
-def run_test():
+def remove_generated(manifest_path):
+    """Remove the rst files generated by the last run, so files that are no longer generated do not linger."""
+    try:
+        with open(manifest_path) as manifest_fd:
+            generated = json.load(manifest_fd)
+    except (OSError, ValueError):
+        return
+
+    for path in generated:
+        if os.path.lexists(path):
+            os.remove(path)
+
+
+def run_test(sources=None):
+    """Build the docs and print the warnings. With the paths of the synced sources, build incrementally."""
     base_dir = os.getcwd() + os.path.sep
     docs_dir = os.path.abspath('docs/docsite')
 
-    cmd = ['make', 'core_singlehtmldocs']
-    sphinx = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, cwd=docs_dir, check=False, text=True)
+    if sources is None:
+        run_make(['make', 'core_singlehtmldocs'], docs_dir)
+    else:
+        remove_generated(GENERATED_MANIFEST)
+        run_make(['make', 'core_structure', 'core_generate_rst'], docs_dir, span='generate')
 
-    stdout = sphinx.stdout
-    stderr = sphinx.stderr
+        with PROFILER.span('keep_mtimes'):
+            keep_generated_mtimes('docs/docsite/rst', sources)
 
-    if sphinx.returncode != 0:
-        sys.stderr.write("Command '%s' failed with status code: %d\n" % (' '.join(cmd), sphinx.returncode))
+        # The rst was generated above, so the generators are a no-op for the build.
+        run_make(['make', 'core_singlehtmldocs'] + ['%s=:' % variable for variable in GENERATOR_VARIABLES], docs_dir)
 
-        if stdout.strip():
-            stdout = simplify_stdout(stdout)
+    if os.environ.get(UPDATE_BASELINE_ENV) == '1':
+        update_baseline('docs/docsite/rst_warnings', base_dir)
+    else:
+        # Sphinx only warns about the documents it read, so an incremental build cannot tell which warnings were fixed.
+        report_warnings('docs/docsite/rst_warnings', base_dir, report_fixed=sources is None)
 
-            sys.stderr.write("--> Standard Output\n")
-            sys.stderr.write("%s\n" % stdout.strip())
 
-        if stderr.strip():
-            sys.stderr.write("--> Standard Error\n")
-            sys.stderr.write("%s\n" % stderr.strip())
+def report_warnings(warnings_path, base_dir, report_fixed=True):
+    """Print the warnings in the file as results, then a summary of them by code on stderr when run directly.
 
-        sys.exit(1)
+    With a baseline, only the warnings it does not list are printed, and the ones it lists that the build no longer
+    reported, as fixed-warning results.
+    """
+    baseline = load_baseline(BASELINE_PATH)
+    counts = collections.Counter()
 
-    with open('docs/docsite/rst_warnings', 'r') as warnings_fd:
-        output = warnings_fd.read().strip()
-        lines = output.splitlines()
-
-    known_warnings = {
-        'block-quote-missing-blank-line': r'^Block quote ends without a blank line; unexpected unindent.$',
-        'literal-block-lex-error': r'^Could not lex literal_block as "[^"]*". Highlighting skipped.$',
-        'duplicate-label': r'^duplicate label ',
-        'undefined-label': r'undefined label: ',
-        'unknown-document': r'unknown document: ',
-        'toc-tree-missing-document': r'toctree contains reference to nonexisting document ',
-        'reference-target-not-found': r'[^ ]* reference target not found: ',
-        'not-in-toc-tree': r"document isn't included in any toctree$",
-        'unexpected-indentation': r'^Unexpected indentation.$',
-        'definition-list-missing-blank-line': r'^Definition list ends without a blank line; unexpected unindent.$',
-        'explicit-markup-missing-blank-line': r'Explicit markup ends without a blank line; unexpected unindent.$',
-        'toc-tree-glob-pattern-no-match': r"^toctree glob pattern '[^']*' didn't match any documents$",
-        'unknown-interpreted-text-role': '^Unknown interpreted text role "[^"]*".$',
-    }
+    for path, lineno, column, code, message in read_warnings(warnings_path, base_dir):
+        if baseline is not None:
+            key = baseline_key(path, code, message, base_dir)
 
-    for line in lines:
-        match = re.search('^(?P<path>[^:]+):((?P<line>[0-9]+):)?((?P<column>[0-9]+):)? (?P<level>WARNING|ERROR): (?P<message>.*)$', line)
+            if baseline[key] > 0:
+                baseline[key] -= 1
+                continue
 
-        if not match:
-            path = 'docs/docsite/rst/index.rst'
-            lineno = 0
-            column = 0
-            code = 'unknown'
-            message = line
+        counts[code] += 1
 
-            # surface unknown lines while filtering out known lines to avoid excessive output
-            print('%s:%d:%d: %s: %s' % (path, lineno, column, code, message))
-            continue
+        print('%s:%d:%d: %s: %s' % (path, lineno, column, code, message))
+
+    if baseline is not None and report_fixed:
+        for (path, code, message), count in sorted((+baseline).items()):
+            counts['fixed-warning'] += count
+
+            for _ in range(count):
+                print('%s:0:0: fixed-warning: no longer reported, remove it from %s: %s: %s' % (
+                    path, os.path.basename(BASELINE_PATH), code, message))
+
+    # Any output on stderr fails the check, which the warnings above already do. The checker runner prints its own
+    # summary by code.
+    if counts and not os.environ.get(RUNNER_ENV):
+        print_histogram(counts)
+
+
+def read_warnings(warnings_path, base_dir):
+    """Yield the path, line, column, code and message of each warning in the file."""
+    with open(warnings_path, 'r') as warnings_fd:
+        for line in warnings_fd:
+            line = line.rstrip('\n')
+
+            if line.strip():
+                yield classify_warning(line, base_dir)
+
+
+def baseline_key(path, code, message, base_dir):
+    """Return the key of a warning in the baseline, without the location of the copy the docs were built in."""
+    return path, code, ' '.join(message.replace(base_dir, '').split())
+
+
+def load_baseline(baseline_path):
+    """Return the number of times each key of the baseline is listed, or None without a baseline."""
+    try:
+        with open(baseline_path, 'r') as baseline_fd:
+            return collections.Counter(tuple(line.rstrip('\n').split('\t', 2)) for line in baseline_fd if line.strip())
+    except FileNotFoundError:
+        return None
+
+
+def update_baseline(warnings_path, base_dir):
+    """Replace the baseline with the warnings in the file."""
+    keys = []
+
+    for path, _lineno, _column, code, message in read_warnings(warnings_path, base_dir):
+        keys.append(baseline_key(path, code, message, base_dir))
+
+    with open(BASELINE_PATH, 'w') as baseline_fd:
+        baseline_fd.writelines('%s\n' % '\t'.join(key) for key in sorted(keys))
 
-        path = match.group('path')
-        lineno = int(match.group('line') or 0)
-        column = int(match.group('column') or 0)
-        level = match.group('level').lower()
-        message = match.group('message')
 
-        path = os.path.abspath(path)
+def classify_warning(line, base_dir):
+    """Return the path, line, column, code and message of a line of the warnings file."""
+    match = WARNING_RE.match(line)
 
-        if path.startswith(base_dir):
-            path = path[len(base_dir):]
+    if not match:
+        # surface unknown lines while filtering out known lines to avoid excessive output
+        return 'docs/docsite/rst/index.rst', 0, 0, 'unknown', line
 
-        if path.startswith('rst/'):
-            path = 'docs/docsite/' + path  # fix up paths reported relative to `docs/docsite/`
+    path = match.group('path')
+    lineno = int(match.group('line') or 0)
+    column = int(match.group('column') or 0)
+    level = match.group('level').lower()
+    message = match.group('message')
 
-        if level == 'warning':
-            code = 'warning'
+    path = os.path.abspath(path)
 
-            for label, pattern in known_warnings.items():
-                if re.search(pattern, message):
-                    code = label
-                    break
+    if path.startswith(base_dir):
+        path = path[len(base_dir):]
+
+    if path.startswith('rst/'):
+        path = 'docs/docsite/' + path  # fix up paths reported relative to `docs/docsite/`
+
+    if level == 'warning':
+        known = KNOWN_WARNING_RE.match(message)
+        code = KNOWN_WARNING_GROUPS[known.lastgroup] if known else 'warning'
+    else:
+        code = 'error'
+
+    return path, lineno, column, code, message
+
+
+def print_histogram(counts):
+    width = max(len(code) for code in counts)
+    most = max(counts.values())
+
+    sys.stderr.write('%d result(s) by code:\n' % sum(counts.values()))
+
+    for code, count in counts.most_common():
+        bar = '#' * max(1, round(HISTOGRAM_WIDTH * count / most))
+        sys.stderr.write('%s %6d %s\n' % (code.ljust(width), count, bar))
+
+
+def run_make(cmd, docs_dir, span='make'):
+    """Run make in the docs directory, exiting with its output if it fails."""
+    with PROFILER.span(span):
+        if os.environ.get(STREAM_ENV):
+            # The output was already shown as progress, so it is not repeated on failure.
+            returncode = run_streaming(cmd, docs_dir)
+            stdout = stderr = ''
         else:
-            code = 'error'
+            sphinx = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, cwd=docs_dir, check=False, text=True)
 
-        print('%s:%d:%d: %s: %s' % (path, lineno, column, code, message))
+            returncode = sphinx.returncode
+            stdout = sphinx.stdout
+            stderr = sphinx.stderr
+
+    if returncode != 0:
+        sys.stderr.write("Command '%s' failed with status code: %d\n" % (' '.join(cmd), returncode))
+
+        if stdout.strip():
+            stdout = simplify_stdout(stdout)
+
+            sys.stderr.write("--> Standard Output\n")
+            sys.stderr.write("%s\n" % stdout.strip())
+
+        if stderr.strip():
+            sys.stderr.write("--> Standard Error\n")
+            sys.stderr.write("%s\n" % stderr.strip())
+
+        sys.exit(1)
+
+
+def run_streaming(cmd, cwd):
+    """Run the command, forwarding its combined output to stderr line by line as progress."""
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=cwd, text=True)
+
+    for line in process.stdout:
+        sys.stderr.write(line)
+        sys.stderr.flush()
+
+    return process.wait()
 
 
 def simplify_stdout(value):
@@ -0,0 +1,402 @@
+"""Sanity test running the rstcheck and rst-yamllint checks on a single parse of each document.
+
+Both checkers parse every document with docutils, which is most of their work. This checker
+parses each document once, with the directives and roles rstcheck sets up, and runs rstcheck's
+validations and rst-yamllint's code block checks on the same doctree. The results are those of
+the two checkers, each applied to the files its own configuration selects.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import contextlib
+import importlib.util
+import json
+import os
+import pathlib
+import re
+import sys
+import types
+import typing as t
+
+import docutils.core
+import docutils.io
+import docutils.utils
+from _cache import CodeBlock, IndexedDocument, get_jobs
+from _profiling import FILE_SPAN, PROFILER, finish
+from antsibull_docutils.rst_code_finder import (
+    find_code_blocks_in_document,
+    mark_antsibull_code_block,
+)
+from docutils import nodes
+from docutils.parsers.rst import Directive, directives, roles
+from docutils.parsers.rst.directives.body import ParsedLiteral
+from sphinx.directives.code import CodeBlock as SphinxCodeBlock
+from sphinx.directives.patches import Code as SphinxCode
+
+CHECKERS_DIR = pathlib.Path(__file__).resolve().parent
+REPO_ROOT = CHECKERS_DIR.parent.parent
+
+# Directives and roles registered with docutils, by name.
+Registry = tuple[dict[str, t.Any], dict[str, t.Any]]
+
+# Set on the literal blocks of parsed-literal directives, which rst-yamllint ignores.
+PARSED_LITERAL = "rst-lint-parsed-literal"
+
+
+def load_checker(name: str) -> types.ModuleType:
+    """Import a checker next to this one, reusing it if the checker runner already imported it."""
+    module_name = "checker_" + name.replace("-", "_")
+
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            module_name, CHECKERS_DIR / f"{name}.py"
+        )
+        assert spec is not None and spec.loader is not None
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+
+    return sys.modules[module_name]
+
+
+def load_ignore_patterns(name: str) -> list[re.Pattern[str]]:
+    with open(CHECKERS_DIR / f"{name}.json", encoding="utf-8") as f:
+        return [re.compile(regex) for regex in json.load(f).get("ignore_regexs", [])]
+
+
+RSTCHECK = load_checker("rstcheck")
+RST_YAMLLINT = load_checker("rst-yamllint")
+
+RSTCHECK_IGNORE_PATTERNS = load_ignore_patterns("rstcheck")
+RST_YAMLLINT_IGNORE_PATTERNS = load_ignore_patterns("rst-yamllint")
+
+
+def mark_code_blocks(
+    directive: Directive, result: list[nodes.Node]
+) -> list[nodes.Node]:
+    """Mark the literal blocks a code block directive returned, so find_code_blocks_in_document finds them."""
+    for node in result:
+        if isinstance(node, nodes.system_message):
+            continue
+
+        for literal_block in node.findall(nodes.literal_block):
+            mark_antsibull_code_block(
+                literal_block,
+                language=directive.arguments[0] if directive.arguments else None,
+                content_offset=directive.content_offset,
+            )
+
+    return result
+
+
+class CodeBlockDirective(SphinxCodeBlock):
+    """Sphinx's code-block directive, so rstcheck sees the same nodes as without this checker."""
+
+    def run(self) -> list[nodes.Node]:
+        return mark_code_blocks(self, super().run())
+
+
+class CodeDirective(SphinxCode):
+    """Sphinx's code directive, see CodeBlockDirective."""
+
+    def run(self) -> list[nodes.Node]:
+        return mark_code_blocks(self, super().run())
+
+
+class ParsedLiteralDirective(ParsedLiteral):
+    """The parsed-literal directive, marking its literal block so it is not reported as one without language."""
+
+    def run(self) -> list[nodes.Node]:
+        result = super().run()
+
+        for node in result:
+            if isinstance(node, nodes.literal_block):
+                node[PARSED_LITERAL] = True
+
+        return result
+
+
+DIRECTIVES: dict[str, type[Directive]] = {
+    "code": CodeDirective,
+    "code-block": CodeBlockDirective,
+    "sourcecode": CodeBlockDirective,
+    "parsed-literal": ParsedLiteralDirective,
+}
+
+
+class MessageStream:
+    """A warning stream that keeps the system messages docutils reports, one write per message."""
+
+    def __init__(self) -> None:
+        self.messages: list[str] = []
+
+    def write(self, text: str) -> None:
+        self.messages.append(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def main() -> None:
+    paths = sys.argv[1:] or sys.stdin.read().splitlines()
+    jobs = min(get_jobs(), len(paths))
+
+    if jobs > 1:
+        # One contiguous shard per worker, so each worker sets up Sphinx once.
+        size = -(-len(paths) // jobs)
+        shards = [paths[start : start + size] for start in range(0, len(paths), size)]
+        results: list[dict[str, t.Any]] = []
+
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            for shard_results, events in executor.map(check_shard, shards):
+                results.extend(shard_results)
+                PROFILER.events.extend(events)
+    else:
+        results = check(paths)
+
+    with PROFILER.span("output"):
+        for result in sorted(results, key=result_sort_key):
+            print("{path}:{line}:{col}: {message}".format(**result))
+
+    finish()
+
+
+def result_sort_key(result: dict[str, t.Any]) -> tuple[str, int, int, str]:
+    """Sort results like rst-yamllint does, with lines that are not numbers, such as "unknown", first."""
+    line = result["line"]
+
+    return (
+        result["path"],
+        line if isinstance(line, int) else 0,
+        result["col"],
+        result["message"],
+    )
+
+
+def check_shard(
+    paths: list[str],
+) -> tuple[list[dict[str, t.Any]], list[dict[str, t.Any]]]:
+    return check(paths), PROFILER.pop_events()
+
+
+def check(paths: list[str]) -> list[dict[str, t.Any]]:
+    args = RSTCHECK.make_args()
+    results: list[dict[str, t.Any]] = []
+
+    with contextlib.ExitStack() as stack:
+        with PROFILER.span("setup"):
+            registry: Registry = (
+                dict(directives._directives),  # type: ignore[attr-defined]
+                dict(roles._roles),  # type: ignore[attr-defined]
+            )
+            RSTCHECK.enable_sphinx(stack)
+            RSTCHECK.rstcheck.ignore_sphinx()
+            context = stack.enter_context(RST_YAMLLINT.open_context())
+
+        for path in paths:
+            with PROFILER.span(FILE_SPAN, path=path):
+                check_file(path, args, context, registry, results)
+
+    return results
+
+
+def check_file(
+    path: str,
+    args: t.Any,
+    context: t.Any,
+    registry: Registry,
+    results: list[dict[str, t.Any]],
+) -> None:
+    """Check one file the way rstcheck.check_file() and rst-yamllint's check_document() do."""
+    rel_path = os.path.relpath(path, REPO_ROOT)
+    run_rstcheck = not any(
+        pattern.match(rel_path) for pattern in RSTCHECK_IGNORE_PATTERNS
+    )
+    run_yamllint = not any(
+        pattern.match(rel_path) for pattern in RST_YAMLLINT_IGNORE_PATTERNS
+    )
+
+    try:
+        source, args = RSTCHECK.load_file(path, args)
+    except (OSError, UnicodeError) as ex:
+        if run_rstcheck:
+            results.append(RSTCHECK.make_error(path, ex))
+
+        if run_yamllint:
+            check_document(path, context, registry, results)
+
+        return
+
+    rstcheck = RSTCHECK.rstcheck
+    errors: list[tuple[int, str]] = []
+    ignore = {
+        "languages": args.ignore_language,
+        "messages": args.ignore_messages,
+    }
+
+    if run_rstcheck:
+        try:
+            ignore.setdefault("languages", []).extend(
+                rstcheck.find_ignored_languages(source)
+            )
+        except rstcheck.Error as error:
+            errors.append((error.line_number, f"{error}"))
+
+    # The same steps as docutils.core.publish_string() in rstcheck.check(), except that
+    # parsing does not stop at the first warning, so the code blocks can be found in
+    # the whole document. rstcheck's behavior is restored below.
+    for name, directive in DIRECTIVES.items():
+        directives.register_directive(name, directive)
+
+    stream = MessageStream()
+    writer = rstcheck.CheckWriter(source, path, ignore=ignore)
+    publisher = docutils.core.Publisher(
+        writer=writer,
+        source_class=docutils.io.StringInput,
+        destination_class=docutils.io.NullOutput,
+    )
+    publisher.set_components("standalone", "restructuredtext", "null")
+    publisher.process_programmatic_settings(
+        None,
+        {
+            "halt_level": docutils.utils.Reporter.SEVERE_LEVEL + 1,
+            "report_level": args.report,
+            "warning_stream": stream,
+        },
+        None,
+    )
+    publisher.set_source(rstcheck.strip_byte_order_mark(source), path)
+    publisher.set_destination()
+
+    try:
+        with PROFILER.span("parse", path=path):
+            document = publisher.document = publisher.reader.read(
+                publisher.source, publisher.parser, publisher.settings
+            )
+    except AttributeError:
+        # Like rstcheck, which gives up on the document when a Sphinx directive needs a
+        # build environment.
+        document = None
+
+    if run_yamllint:
+        if document is None:
+            check_document(path, context, registry, results)
+        else:
+            check_code_blocks(path, document, source, context, results)
+
+    if not run_rstcheck:
+        return
+
+    if document is not None and not stream.messages:
+        for literal_block in document.findall(nodes.literal_block):
+            # rstcheck counts the attributes of a code block to find where its code starts.
+            for key in list(literal_block.attributes):
+                if key.startswith("antsibull-") or key == PARSED_LITERAL:
+                    del literal_block[key]
+
+        try:
+            with PROFILER.span("rstcheck", path=path):
+                publisher.apply_transforms()
+
+                if not stream.messages:
+                    # rstcheck stops at the first message it reports, including the
+                    # ones its translator reports while looking for code blocks.
+                    document.reporter.halt_level = args.report
+                    writer.write(document, publisher.destination)
+        except (docutils.utils.SystemMessage, AttributeError):
+            pass
+
+        for checker in writer.checkers:
+            errors.extend(checker())
+
+    if stream.messages:
+        # Only the first message, where rstcheck stopped.
+        for message in stream.messages[0].strip().splitlines():
+            if ignore["messages"] and re.search(ignore["messages"], message):
+                continue
+
+            try:
+                errors.append(
+                    rstcheck.parse_gcc_style_error_message(
+                        message, filename=path, has_column=False
+                    )
+                )
+            except ValueError:
+                continue
+
+    results.extend(
+        RSTCHECK.make_result(path, line, message) for line, message in errors
+    )
+
+
+def check_document(
+    path: str, context: t.Any, registry: Registry, results: list[dict[str, t.Any]]
+) -> None:
+    """Let rst-yamllint parse the document itself, with the directives and roles registered before Sphinx was set up."""
+    # Unlike docutils_namespace(), keep the node classes Sphinx registered.
+    current: Registry = (
+        directives._directives,  # type: ignore[attr-defined]
+        roles._roles,  # type: ignore[attr-defined]
+    )
+    directives._directives = dict(registry[0])  # type: ignore[attr-defined]
+    roles._roles = dict(registry[1])  # type: ignore[attr-defined]
+
+    try:
+        RST_YAMLLINT.check_document(path, context, RST_YAMLLINT.DOCS_ROOT, results)
+    finally:
+        directives._directives, roles._roles = current  # type: ignore[attr-defined]
+
+
+def check_code_blocks(
+    path: str,
+    document: nodes.document,
+    source: str,
+    context: t.Any,
+    results: list[dict[str, t.Any]],
+) -> None:
+    """Run rst-yamllint's checks on the code blocks of a parsed document."""
+    parsed_literals = {
+        (node.line or "unknown", node.rawsource)
+        for node in document.findall(nodes.literal_block)
+        if node.get(PARSED_LITERAL)
+    }
+    warnings: list[list[t.Any]] = []
+
+    def warn_unknown_block(
+        line: int | str, col: int, content: str, unknown_directive: bool
+    ) -> None:
+        if (line, content) not in parsed_literals:
+            warnings.append([line, col, content, unknown_directive])
+
+    try:
+        with PROFILER.span("find_code_blocks", path=path):
+            blocks = [
+                CodeBlock(
+                    code_block.language,
+                    code_block.row_offset,
+                    code_block.col_offset,
+                    code_block.content,
+                )
+                for code_block in find_code_blocks_in_document(
+                    document=document,
+                    content=source,
+                    warn_unknown_block_w_unknown_info=warn_unknown_block,
+                )
+            ]
+
+        RST_YAMLLINT.check_code_blocks(
+            path,
+            IndexedDocument(
+                blocks, warnings, RST_YAMLLINT.find_literal_includes(source)
+            ),
+            context,
+            RST_YAMLLINT.DOCS_ROOT,
+            results,
+        )
+    except Exception as exc:
+        results.append(RST_YAMLLINT.make_document_error(path, exc))
+
+
+if __name__ == "__main__":
+    main()
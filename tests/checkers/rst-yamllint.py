@@ -2,17 +2,76 @@
 
 from __future__ import annotations
 
+import argparse
+import concurrent.futures
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import importlib.metadata
 import io
+import multiprocessing.util
+import os
 import pathlib
+import re
 import sys
 import traceback
 import typing as t
 
+import docutils
+import yamllint
+from _cache import (
+    CodeBlock,
+    CodeBlockIndex,
+    FileStamp,
+    IndexedDocument,
+    LiteralInclude,
+    SnippetCache,
+    SnippetProblem,
+    get_jobs,
+    stamp,
+)
+from _profiling import FILE_SPAN, PROFILER, finish
 from antsibull_docutils.rst_code_finder import find_code_blocks
 from yamllint import linter
 from yamllint.config import YamlLintConfig
 from yamllint.linter import PROBLEM_LEVELS
 
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+DOCS_ROOT = REPO_ROOT / "docs" / "docsite" / "rst"
+
+# Documents with more YAML blocks than this have their blocks linted in chunks of
+# BLOCK_CHUNK_SIZE on other workers, so one large page does not hold up the run.
+LARGE_PAGE_BLOCKS = 40
+BLOCK_CHUNK_SIZE = 10
+
+# Changes to the parser can change the code blocks found in unchanged documents.
+PARSER_VERSION = (
+    f"antsibull-docutils {importlib.metadata.version('antsibull-docutils')},"
+    f" docutils {docutils.__version__}, root {DOCS_ROOT}"
+)
+
+# Files included by a document are parsed as part of it.
+INCLUDE_RE = re.compile(r"^\s*\.\.\s+include::\s*(?P<target>[^\s<]\S*)", re.MULTILINE)
+
+# Sphinx's literalinclude directive and its options, which are indented further.
+LITERALINCLUDE_RE = re.compile(
+    r"^(?P<indent>[ \t]*)\.\.[ \t]+literalinclude::[ \t]*(?P<target>\S+)[ \t]*$"
+    r"(?P<options>(?:\n(?P=indent)[ \t]+:[\w-]+:.*$)*)",
+    re.MULTILINE,
+)
+OPTION_RE = re.compile(
+    r"^[ \t]*:(?P<name>[\w-]+):[ \t]*(?P<value>.*?)[ \t]*$", re.MULTILINE
+)
+
+# Options of literalinclude that select the lines that are shown.
+LINE_OPTIONS = ("start-after", "start-at", "end-before", "end-at", "lines")
+
+YAML_LANGUAGES = {
+    "yaml",
+    "yaml+jinja",
+}
+
 REPORT_LEVELS: set[PROBLEM_LEVELS] = {
     "warning",
     "error",
@@ -52,6 +111,8 @@ def create_warn_unknown_block(
                     "path": path,
                     "line": line,
                     "col": col,
+                    "severity": "warning",
+                    "code": "unknown-literal-block",
                     "message": (
                         "Warning: found unknown literal block! Check for double colons '::'."
                         " If that is not the cause, please report this warning."
@@ -67,6 +128,8 @@ def create_warn_unknown_block(
                     "path": path,
                     "line": line,
                     "col": 0,
+                    "severity": "warning",
+                    "code": "literal-block",
                     "message": (
                         "Warning: literal block (check for double colons '::')."
                         " Please convert this to a regular code block with an appropriate language."
@@ -78,122 +141,670 @@ def create_warn_unknown_block(
     return warn_unknown_block
 
 
-def main() -> None:
-    paths = sys.argv[1:] or sys.stdin.read().splitlines()
+@functools.cache
+def load_yamllint_config(content: str) -> YamlLintConfig:
+    """Parse the config once per process, so repeated checks (for example in watch mode) reuse it."""
+    return YamlLintConfig(content)
+
+
+def get_yamllint_config() -> tuple[YamlLintConfig, str]:
+    """Return the yamllint configuration and a digest of it and the yamllint version, for the snippet cache."""
+    with open(REPO_ROOT / ".yamllint", encoding="utf-8") as f:
+        content = f.read()
+
+    digest = hashlib.sha256(f"{yamllint.__version__}\0{content}".encode("utf-8"))
+
+    return load_yamllint_config(content), digest.hexdigest()
+
+
+@dataclasses.dataclass
+class LintContext:
+    yamllint_config: YamlLintConfig
+    snippets: SnippetCache
+    code_blocks: CodeBlockIndex
+    # Lines of the files included with literalinclude, and the problems found in the
+    # included parts, so a file included from many documents is read and linted once.
+    included_files: dict[str, list[str]] = dataclasses.field(default_factory=dict)
+    included_problems: dict[
+        tuple[str, tuple[tuple[str, str], ...]], list[SnippetProblem]
+    ] = dataclasses.field(default_factory=dict)
+
+
+@contextlib.contextmanager
+def open_context() -> t.Iterator[LintContext]:
+    """Load the yamllint configuration and open the caches, storing their updates at the end."""
+    yamllint_config, config_digest = get_yamllint_config()
+    snippets = SnippetCache.open(config_digest)
+    code_blocks = CodeBlockIndex.open(PARSER_VERSION)
+
+    try:
+        yield LintContext(yamllint_config, snippets, code_blocks)
+    finally:
+        snippets.close()
+        code_blocks.close()
+
+
+# The lint context of a worker process, shared by all the tasks it runs.
+_worker_context: LintContext | None = None
+
+
+def init_worker() -> None:
+    """Open the lint context of a worker process once, for all the tasks it runs."""
+    global _worker_context
+
+    stack = contextlib.ExitStack()
+    _worker_context = stack.enter_context(open_context())
+    # Workers do not run atexit handlers when they exit, but they do run multiprocessing's finalizers.
+    multiprocessing.util.Finalize(None, stack.close, exitpriority=0)
+
+
+def check(
+    paths: list[str], executor: concurrent.futures.Executor | None = None
+) -> list[dict[str, t.Any]]:
+    """Check the documents, on the executor's workers if one is given.
+
+    The executor's workers must run init_worker() when they start.
+    """
+    if executor is not None:
+        return check_parallel(paths, executor)
+
     results: list[dict[str, t.Any]] = []
 
-    # TODO: should we handle the 'literalinclude' directive? maybe check file directly if right extension?
-    # (https://www.sphinx-doc.org/en/master/usage/restructuredtext/directives.html#directive-literalinclude)
+    with open_context() as context:
+        for path in paths:
+            with PROFILER.span(FILE_SPAN, path=path):
+                check_document(path, context, DOCS_ROOT, results)
+
+    return results
 
-    repo_root = pathlib.Path(__file__).resolve().parent.parent.parent
-    docs_root = repo_root / "docs" / "docsite" / "rst"
 
-    with open(repo_root / ".yamllint", encoding="utf-8") as f:
-        yamllint_config = YamlLintConfig(f.read())
+def check_parallel(
+    paths: list[str], executor: concurrent.futures.Executor
+) -> list[dict[str, t.Any]]:
+    """Check one document per task, and fan out the YAML blocks of large documents.
+
+    Results are collected in the order of ``paths``, so the output does not depend on
+    which worker finishes first.
+    """
+    document_futures = {
+        executor.submit(check_document_task, path): path for path in paths
+    }
+    documents: dict[str, list[dict[str, t.Any]]] = {}
+    block_futures: dict[str, list[concurrent.futures.Future[t.Any]]] = {}
+
+    for future in concurrent.futures.as_completed(document_futures):
+        path = document_futures[future]
+        document_results, yaml_blocks, events = future.result()
+        PROFILER.events.extend(events)
+        documents[path] = document_results
+        block_futures[path] = [
+            executor.submit(
+                lint_blocks_task, path, yaml_blocks[start : start + BLOCK_CHUNK_SIZE]
+            )
+            for start in range(0, len(yaml_blocks), BLOCK_CHUNK_SIZE)
+        ]
+
+    results: list[dict[str, t.Any]] = []
 
     for path in paths:
+        results.extend(documents[path])
+
+        for block_future in block_futures[path]:
+            block_results, events = block_future.result()
+            PROFILER.events.extend(events)
+            results.extend(block_results)
+
+    return results
+
+
+def check_document_task(
+    path: str,
+) -> tuple[list[dict[str, t.Any]], list[tuple[int, int, str]], list[dict[str, t.Any]]]:
+    """Check one document in a worker.
+
+    The YAML blocks of documents with more than LARGE_PAGE_BLOCKS of them are returned
+    instead of linted, so they can be spread over other workers.
+    """
+    results: list[dict[str, t.Any]] = []
+    yaml_blocks: list[tuple[int, int, str]] = []
+
+    assert _worker_context is not None
+
+    with PROFILER.span(FILE_SPAN, path=path):
+        check_document(path, _worker_context, DOCS_ROOT, results, yaml_blocks)
+
+    return results, yaml_blocks, PROFILER.pop_events()
+
+
+def lint_blocks_task(
+    path: str, yaml_blocks: list[tuple[int, int, str]]
+) -> tuple[list[dict[str, t.Any]], list[dict[str, t.Any]]]:
+    """Lint a chunk of the YAML blocks of one document in a worker."""
+    results: list[dict[str, t.Any]] = []
+
+    assert _worker_context is not None
+
+    with PROFILER.span(FILE_SPAN, path=path):
+        for row_offset, col_offset, content in yaml_blocks:
+            lint_yaml_block(
+                path, row_offset, col_offset, content, _worker_context, results
+            )
+
+    return results, PROFILER.pop_events()
+
+
+def check_document(
+    path: str,
+    context: LintContext,
+    docs_root: pathlib.Path,
+    results: list[dict[str, t.Any]],
+    deferred_yaml_blocks: list[tuple[int, int, str]] | None = None,
+) -> None:
+    """Lint the YAML code blocks of one document.
+
+    If ``deferred_yaml_blocks`` is given and the document has more than LARGE_PAGE_BLOCKS
+    YAML blocks, they are appended to it instead of being linted.
+    """
+    try:
+        document = get_code_blocks(path, docs_root, context.code_blocks)
+        check_code_blocks(
+            path, document, context, docs_root, results, deferred_yaml_blocks
+        )
+    except Exception as exc:
+        results.append(make_document_error(path, exc))
+
+
+def check_code_blocks(
+    path: str,
+    document: IndexedDocument,
+    context: LintContext,
+    docs_root: pathlib.Path,
+    results: list[dict[str, t.Any]],
+    deferred_yaml_blocks: list[tuple[int, int, str]] | None = None,
+) -> None:
+    """Check the code blocks found in a document, see check_document()."""
+    warn_unknown_block = create_warn_unknown_block(results, path)
+
+    for warning in document.warnings:
+        warn_unknown_block(*warning)
+
+    code_blocks = document.blocks
+
+    defer = (
+        deferred_yaml_blocks is not None
+        and sum(code_block.language in YAML_LANGUAGES for code_block in code_blocks)
+        > LARGE_PAGE_BLOCKS
+    )
+
+    for code_block in code_blocks:
+        # Now that we have the offsets, we can actually do some processing...
+        if code_block.language not in YAML_LANGUAGES:
+            if code_block.language is None:
+                allowed_languages = ", ".join(sorted(ALLOWED_LANGUAGES))
+                results.append(
+                    {
+                        "path": path,
+                        "line": code_block.row_offset + 1,
+                        "col": code_block.col_offset + 1,
+                        "severity": "error",
+                        "code": "literal-block-without-language",
+                        "message": (
+                            "Literal block without language!"
+                            f" Allowed languages are: {allowed_languages}."
+                        ),
+                    }
+                )
+            elif code_block.language not in ALLOWED_LANGUAGES:
+                allowed_languages = ", ".join(sorted(ALLOWED_LANGUAGES))
+                results.append(
+                    {
+                        "path": path,
+                        "line": code_block.row_offset + 1,
+                        "col": code_block.col_offset + 1,
+                        "severity": "warning",
+                        "code": "disallowed-language",
+                        "message": (
+                            f"Warning: literal block with disallowed language: {code_block.language}."
+                            " If the language should be allowed, the checker needs to be updated."
+                            f" Currently allowed languages are: {allowed_languages}."
+                        ),
+                    }
+                )
+            continue
+
+        # So we have YAML. Let's lint it!
+        if defer:
+            assert deferred_yaml_blocks is not None
+            deferred_yaml_blocks.append(
+                (code_block.row_offset, code_block.col_offset, code_block.content)
+            )
+            continue
+
+        lint_yaml_block(
+            path,
+            code_block.row_offset,
+            code_block.col_offset,
+            code_block.content,
+            context,
+            results,
+        )
+
+    for literal_include in document.literal_includes:
+        lint_literal_include(path, literal_include, context, docs_root, results)
+
+
+def make_document_error(path: str, exc: Exception) -> dict[str, t.Any]:
+    error = str(exc).replace("\n", " / ")
+    return {
+        "path": path,
+        "line": 0,
+        "col": 0,
+        "severity": "error",
+        "code": "document-error",
+        "message": f"Cannot process document: {type(exc)} {error}; traceback: {traceback.format_exc()!r}",
+    }
+
+
+def get_code_blocks(
+    path: str, docs_root: pathlib.Path, index: CodeBlockIndex
+) -> IndexedDocument:
+    """Return the code blocks of a document, only parsing it if it or a file it includes changed since it was indexed."""
+    document = index.get(path)
+
+    if document is not None:
+        return document
+
+    with PROFILER.span("read", path=path):
+        files: list[FileStamp] = [stamp(path)]
+
         with open(path, "rt", encoding="utf-8") as f:
             content = f.read()
 
+        digest = hashlib.sha256(content.encode("utf-8"))
+
+        for include in find_includes(path, content, docs_root):
+            files.append(stamp(include))
+
+            with open(include, "rb") as f:
+                digest.update(f.read())
+
+    document = index.get(path, digest.hexdigest())
+
+    if document is None:
+        warnings: list[list[t.Any]] = []
+
+        with PROFILER.span("find_code_blocks", path=path):
+            blocks = [
+                CodeBlock(
+                    code_block.language,
+                    code_block.row_offset,
+                    code_block.col_offset,
+                    code_block.content,
+                )
+                for code_block in find_code_blocks(
+                    content,
+                    path=path,
+                    root_prefix=docs_root,
+                    warn_unknown_block_w_unknown_info=lambda *args: warnings.append(
+                        list(args)
+                    ),
+                )
+            ]
+
+        document = IndexedDocument(blocks, warnings, find_literal_includes(content))
+
+    index.add(path, files, digest.hexdigest(), document)
+
+    return document
+
+
+def find_includes(path: str, content: str, docs_root: pathlib.Path) -> list[str]:
+    """Return the existing files included by a document, and by the files it includes."""
+    includes: list[str] = []
+    pending = [(path, content)]
+
+    while pending:
+        parent, parent_content = pending.pop()
+
+        for match in INCLUDE_RE.finditer(parent_content):
+            target = match.group("target")
+
+            if target.startswith("/"):
+                include = os.path.normpath(docs_root / target.lstrip("/"))
+            else:
+                include = os.path.normpath(
+                    os.path.join(os.path.dirname(parent), target)
+                )
+
+            if include in includes or include == path or not os.path.isfile(include):
+                continue
+
+            includes.append(include)
+
+            with open(include, "rt", encoding="utf-8", errors="replace") as f:
+                pending.append((include, f.read()))
+
+    return includes
+
+
+def find_literal_includes(content: str) -> list[LiteralInclude]:
+    return [
+        LiteralInclude(
+            line=content.count("\n", 0, match.start()) + 1,
+            col=len(match.group("indent")) + 1,
+            target=match.group("target"),
+            options={
+                option.group("name"): option.group("value")
+                for option in OPTION_RE.finditer(match.group("options"))
+            },
+        )
+        for match in LITERALINCLUDE_RE.finditer(content)
+    ]
+
+
+def lint_literal_include(
+    path: str,
+    literal_include: LiteralInclude,
+    context: LintContext,
+    docs_root: pathlib.Path,
+    results: list[dict[str, t.Any]],
+) -> None:
+    """Lint the part of a YAML file included with literalinclude, reporting problems at the directive."""
+    target = literal_include.target
+    language = literal_include.options.get("language")
+
+    if language is None:
+        if not target.endswith((".yml", ".yaml")):
+            return
+    elif language.lower() not in YAML_LANGUAGES:
+        return
+
+    # Like Sphinx, resolve absolute paths relative to the docs root.
+    if target.startswith("/"):
+        include = os.path.normpath(docs_root / target.lstrip("/"))
+    else:
+        include = os.path.normpath(os.path.join(os.path.dirname(path), target))
+
+    key = (
+        include,
+        tuple(
+            (name, value)
+            for name, value in sorted(literal_include.options.items())
+            if name in LINE_OPTIONS
+        ),
+    )
+
+    try:
+        if key not in context.included_problems:
+            context.included_problems[key] = lint_included_file(
+                include, literal_include.options, context
+            )
+    except (OSError, UnicodeDecodeError, ValueError) as exc:
+        results.append(
+            {
+                "path": path,
+                "line": literal_include.line,
+                "col": literal_include.col,
+                "severity": "error",
+                "code": "literalinclude-error",
+                "message": f"Cannot lint included file {target}: {exc}",
+            }
+        )
+        return
+
+    for line, column, level, desc, rule in context.included_problems[key]:
+        if level not in REPORT_LEVELS:
+            continue
+        msg = f"{target}:{line}:{column}: {level}: {desc}"
+        if rule:
+            msg += f"  ({rule})"
+        results.append(
+            {
+                "path": path,
+                "line": literal_include.line,
+                "col": literal_include.col,
+                "severity": level,
+                "code": rule or "syntax",
+                "message": msg,
+            }
+        )
+
+
+def lint_included_file(
+    include: str, options: dict[str, str], context: LintContext
+) -> list[SnippetProblem]:
+    """Return the problems in the lines of ``include`` selected by the options, with line numbers of the file."""
+    if include not in context.included_files:
+        with PROFILER.span("read", path=include):
+            with open(include, "rt", encoding="utf-8") as f:
+                context.included_files[include] = f.read().splitlines(keepends=True)
+
+    lines = context.included_files[include]
+    selected = select_lines(lines, options)
+
+    if not selected:
+        return []
+
+    problems = lint_snippet(
+        include,
+        0,
+        "".join(lines[index] for index in selected),
+        context.yamllint_config,
+        context.snippets,
+    )
+
+    # Map the lines of the selection back to the lines of the file.
+    return [
+        (selected[min(line, len(selected)) - 1] + 1, column, level, desc, rule)
+        for line, column, level, desc, rule in problems
+    ]
+
+
+def select_lines(lines: list[str], options: dict[str, str]) -> list[int]:
+    """Return the indexes of the lines literalinclude shows, like the filters of Sphinx's LiteralIncludeReader.
+
+    As in Sphinx, start-after and start-at, or end-before and end-at, cannot be used
+    together, options with empty values are ignored, and end-before does not match the
+    first selected line.
+    """
+    for first, second in (("start-after", "start-at"), ("end-before", "end-at")):
+        if first in options and second in options:
+            raise ValueError(f'Cannot use both "{first}" and "{second}" options')
+
+    selected = list(range(len(lines)))
+
+    if options.get("start-at"):
+        name, skip = "start-at", 0
+    elif options.get("start-after"):
+        name, skip = "start-after", 1
+    else:
+        name = None
+
+    if name is not None:
+        for position, index in enumerate(selected):
+            if options[name] in lines[index]:
+                selected = selected[position + skip :]
+                break
+        else:
+            raise ValueError(f"{name} pattern not found: {options[name]}")
+
+    if options.get("end-at"):
+        name, keep = "end-at", 1
+    elif options.get("end-before"):
+        name, keep = "end-before", 0
+    else:
+        name = None
+
+    if name is not None:
+        for position, index in enumerate(selected):
+            if options[name] in lines[index] and (keep or position > 0):
+                selected = selected[: position + keep]
+                break
+        else:
+            raise ValueError(f"{name} pattern not found: {options[name]}")
+
+    if options.get("lines"):
+        selected = [
+            selected[number]
+            for number in parse_line_numbers(options["lines"], len(selected))
+        ]
+
+    return selected
+
+
+def parse_line_numbers(spec: str, total: int) -> list[int]:
+    """Return the 0-based line numbers of a spec like ``1,3-5,8-``, dropping the ones past ``total``."""
+    numbers: list[int] = []
+
+    for part in spec.split(","):
+        begin, dash, end = part.strip().partition("-")
+
         try:
-            for code_block in find_code_blocks(
-                content,
-                path=path,
-                root_prefix=docs_root,
-                warn_unknown_block_w_unknown_info=create_warn_unknown_block(
-                    results, path
-                ),
-            ):
-                # Now that we have the offsets, we can actually do some processing...
-                if code_block.language not in {
-                    "yaml",
-                    "yaml+jinja",
-                }:
-                    if code_block.language is None:
-                        allowed_languages = ", ".join(sorted(ALLOWED_LANGUAGES))
-                        results.append(
-                            {
-                                "path": path,
-                                "line": code_block.row_offset + 1,
-                                "col": code_block.col_offset + 1,
-                                "message": (
-                                    "Literal block without language!"
-                                    f" Allowed languages are: {allowed_languages}."
-                                ),
-                            }
-                        )
-                        return
-                    if code_block.language not in ALLOWED_LANGUAGES:
-                        allowed_languages = ", ".join(sorted(ALLOWED_LANGUAGES))
-                        results.append(
-                            {
-                                "path": path,
-                                "line": code_block.row_offset + 1,
-                                "col": code_block.col_offset + 1,
-                                "message": (
-                                    f"Warning: literal block with disallowed language: {code_block.language}."
-                                    " If the language should be allowed, the checker needs to be updated."
-                                    f" Currently allowed languages are: {allowed_languages}."
-                                ),
-                            }
-                        )
-                    continue
-
-                # So we have YAML. Let's lint it!
-                try:
-                    problems = linter.run(
-                        io.StringIO(code_block.content),
-                        yamllint_config,
-                        path,
-                    )
-                    for problem in problems:
-                        if problem.level not in REPORT_LEVELS:
-                            continue
-                        msg = f"{problem.level}: {problem.desc}"
-                        if problem.rule:
-                            msg += f"  ({problem.rule})"
-                        results.append(
-                            {
-                                "path": path,
-                                "line": code_block.row_offset + problem.line,
-                                "col": code_block.col_offset + problem.column,
-                                "message": msg,
-                            }
-                        )
-                except Exception as exc:
-                    error = str(exc).replace("\n", " / ")
-                    results.append(
-                        {
-                            "path": path,
-                            "line": code_block.row_offset + 1,
-                            "col": code_block.col_offset + 1,
-                            "message": (
-                                f"Internal error while linting YAML: exception {type(exc)}:"
-                                f" {error}; traceback: {traceback.format_exc()!r}"
-                            ),
-                        }
-                    )
-        except Exception as exc:
-            error = str(exc).replace("\n", " / ")
+            if dash:
+                numbers.extend(range(int(begin or 1) - 1, int(end or total)))
+            else:
+                numbers.append(int(begin) - 1)
+        except ValueError:
+            raise ValueError(f"invalid line number spec: {spec!r}") from None
+
+    numbers = [number for number in numbers if 0 <= number < total]
+
+    if not numbers:
+        raise ValueError(f"line number spec is out of range (1-{total}): {spec!r}")
+
+    return numbers
+
+
+def lint_yaml_block(
+    path: str,
+    row_offset: int,
+    col_offset: int,
+    content: str,
+    context: LintContext,
+    results: list[dict[str, t.Any]],
+) -> None:
+    try:
+        problems = lint_snippet(
+            path, row_offset, content, context.yamllint_config, context.snippets
+        )
+        for line, column, level, desc, rule in problems:
+            if level not in REPORT_LEVELS:
+                continue
+            msg = f"{level}: {desc}"
+            if rule:
+                msg += f"  ({rule})"
             results.append(
                 {
                     "path": path,
-                    "line": 0,
-                    "col": 0,
-                    "message": f"Cannot process document: {type(exc)} {error}; traceback: {traceback.format_exc()!r}",
+                    "line": row_offset + line,
+                    "col": col_offset + column,
+                    "severity": level,
+                    "code": rule or "syntax",
+                    "message": msg,
                 }
             )
+    except Exception as exc:
+        error = str(exc).replace("\n", " / ")
+        results.append(
+            {
+                "path": path,
+                "line": row_offset + 1,
+                "col": col_offset + 1,
+                "severity": "error",
+                "code": "internal-error",
+                "message": (
+                    f"Internal error while linting YAML: exception {type(exc)}:"
+                    f" {error}; traceback: {traceback.format_exc()!r}"
+                ),
+            }
+        )
 
-    for result in sorted(
-        results,
-        key=lambda result: (
-            result["path"],
-            result["line"],
-            result["col"],
-            result["message"],
-        ),
-    ):
-        print("{path}:{line}:{col}: {message}".format(**result))
+
+def lint_snippet(
+    path: str,
+    row_offset: int,
+    content: str,
+    yamllint_config: YamlLintConfig,
+    snippets: SnippetCache,
+) -> list[SnippetProblem]:
+    """Return the problems in a YAML snippet, relative to the snippet, linting it only if it is not cached."""
+    if yamllint_config.is_file_ignored(path):
+        return []
+
+    # Rules can be disabled for some paths, so the enabled rules are part of the key.
+    rules = ",".join(sorted(rule.ID for rule in yamllint_config.enabled_rules(path)))
+    key = snippets.key(content, rules)
+    problems = snippets.get(key)
+
+    if problems is None:
+        with PROFILER.span("linter.run", path=path, line=row_offset + 1):
+            problems = [
+                (
+                    problem.line,
+                    problem.column,
+                    problem.level,
+                    problem.desc,
+                    problem.rule,
+                )
+                for problem in linter.run(io.StringIO(content), yamllint_config, path)
+            ]
+
+        snippets.add(key, problems)
+
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "paths", nargs="*", help="files to check (default: read from stdin)"
+    )
+    parser.add_argument(
+        "--pages-with-language",
+        metavar="LANGUAGE",
+        help="list the files with code blocks in LANGUAGE instead of checking them;"
+        " only files that changed since they were last checked are parsed",
+    )
+
+    args = parser.parse_args()
+    paths: list[str] = args.paths or sys.stdin.read().splitlines()
+
+    if args.pages_with_language:
+        print_pages_with_language(paths, args.pages_with_language)
+        return
+
+    jobs = get_jobs()
+
+    if jobs > 1 and len(paths) > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+            jobs, initializer=init_worker
+        ) as executor:
+            results = check(paths, executor)
+    else:
+        results = check(paths)
+
+    with PROFILER.span("output"):
+        for result in sorted(
+            results,
+            key=lambda result: (
+                result["path"],
+                result["line"],
+                result["col"],
+                result["message"],
+            ),
+        ):
+            print("{path}:{line}:{col}: {message}".format(**result))
+
+    finish()
+
+
+def print_pages_with_language(paths: list[str], language: str) -> None:
+    with open_context() as context:
+        for path in sorted(paths):
+            document = get_code_blocks(path, DOCS_ROOT, context.code_blocks)
+
+            if any(code_block.language == language for code_block in document.blocks):
+                print(path)
 
 
 if __name__ == "__main__":
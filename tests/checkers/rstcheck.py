@@ -1,62 +1,187 @@
 """Sanity test using rstcheck and sphinx."""
 from __future__ import annotations
 
+import argparse
+import concurrent.futures
+import contextlib
+import multiprocessing.util
+import os
 import re
-import subprocess
 import sys
 
+import docutils.io
+from sphinx.util.docutils import docutils_namespace
+
+from _cache import get_jobs
+from _profiling import FILE_SPAN, PROFILER, finish
+
+# This file shadows the rstcheck package while its directory is on the module search path, as it is when the file
+# is run directly or loaded by the checker runner. Import the package with that directory left out.
+_search_path = sys.path
+sys.path = [path for path in sys.path if os.path.realpath(path or os.curdir) != os.path.dirname(os.path.realpath(__file__))]
+
+try:
+    import rstcheck
+finally:
+    sys.path = _search_path
+
+# Number of files per task when run directly with more than one worker. The results of each chunk are printed
+# as soon as the chunks before it are done, so they do not pile up in memory however many files are checked.
+CHUNK_SIZE = 20
+
+MESSAGE_RE = re.compile(r'^\((?P<level>INFO|WARNING|ERROR|SEVERE)/[0-4]\) (?P<message>.*)$')
+
 
 def main():
     paths = sys.argv[1:] or sys.stdin.read().splitlines()
+    jobs = min(get_jobs(), len(paths))
+
+    if jobs > 1:
+        chunks = [paths[start:start + CHUNK_SIZE] for start in range(0, len(paths), CHUNK_SIZE)]
+
+        # Chunks are handed to the workers as they become free, and their results come back in the order of the paths.
+        with concurrent.futures.ProcessPoolExecutor(jobs, initializer=init_worker) as executor:
+            for results, events in executor.map(check_chunk, chunks):
+                print_results(results)
+                PROFILER.events.extend(events)
+    else:
+        for results in check_files(paths):
+            print_results(results)
+
+    finish()
+
+
+def print_results(results):
+    for result in results:
+        print('%s:%s:%s: %s' % (result['path'], result['line'], result['col'], result['message']))
+
+    sys.stdout.flush()
+
+
+# Settings of a worker process, which sets up Sphinx once for all the chunks it checks.
+_worker_args = None
+
+
+def init_worker():
+    global _worker_args
+
+    stack = contextlib.ExitStack()
+
+    with PROFILER.span('setup'):
+        enable_sphinx(stack)
+
+    # Workers do not run atexit handlers when they exit, but they do run multiprocessing's finalizers.
+    multiprocessing.util.Finalize(None, stack.close, exitpriority=0)
+    _worker_args = make_args()
+
 
-    encoding = 'utf-8'
+def check_chunk(paths):
+    results = []
 
+    for path in paths:
+        with PROFILER.span(FILE_SPAN, path=path):
+            results.extend(check_file(path, _worker_args))
+
+    return results, PROFILER.pop_events()
+
+
+def check(paths):
+    results = []
+
+    for file_results in check_files(paths):
+        results.extend(file_results)
+
+    return results
+
+
+def check_files(paths):
+    """Yield the results of each file, setting up Sphinx once."""
+    args = make_args()
+
+    with contextlib.ExitStack() as stack:
+        with PROFILER.span('setup'):
+            enable_sphinx(stack)
+
+        for path in paths:
+            with PROFILER.span(FILE_SPAN, path=path):
+                results = check_file(path, args)
+
+            yield results
+
+
+def make_args():
+    """Return the settings of the rstcheck command line options --report, --ignore-roles and --ignore-substitutions."""
     ignore_substitutions = (
         'br',
     )
 
-    cmd = [
-        sys.executable,
-        '-c', 'import rstcheck; rstcheck.main();',
-        '--report', 'warning',
-        '--ignore-roles', 'ansplugin,ansopt,ansretval,ansval,ansenvvar,ansenvvarref',
-        '--ignore-substitutions', ','.join(ignore_substitutions),
-    ] + paths
+    return argparse.Namespace(
+        config=None,
+        debug=False,
+        report='warning',
+        ignore_language='',
+        ignore_messages='',
+        ignore_directives='',
+        ignore_roles='ansplugin,ansopt,ansretval,ansval,ansenvvar,ansenvvarref',
+        ignore_substitutions=','.join(ignore_substitutions),
+    )
 
-    process = subprocess.run(cmd,
-                             stdin=subprocess.DEVNULL,
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE,
-                             check=False,
-                             )
 
-    if process.stdout:
-        raise Exception(process.stdout)
+def enable_sphinx(stack):
+    # rstcheck and Sphinx register directives and roles with docutils globally. Restore them when done,
+    # so other checkers using docutils in this process, such as rst-yamllint, are not affected.
+    stack.enter_context(docutils_namespace())
+    stack.enter_context(rstcheck.enable_sphinx_if_possible())
 
-    pattern = re.compile(r'^(?P<path>[^:]*):(?P<line>[0-9]+): \((?P<level>INFO|WARNING|ERROR|SEVERE)/[0-4]\) (?P<message>.*)$')
 
-    results = parse_to_list_of_dict(pattern, process.stderr.decode(encoding))
+def check_file(path, args):
+    """Check one file the way the rstcheck command line does, but return structured results."""
+    try:
+        content, args = load_file(path, args)
+    except (OSError, UnicodeError) as ex:
+        return [make_error(path, ex)]
 
-    for result in results:
-        print('%s:%s:%s: %s' % (result['path'], result['line'], 0, result['message']))
+    ignore = {
+        'languages': args.ignore_language,
+        'messages': args.ignore_messages,
+    }
+
+    errors = rstcheck.check(content, filename=path, report_level=args.report, ignore=ignore)
+
+    return [make_result(path, line, message) for line, message in errors]
 
 
-def parse_to_list_of_dict(pattern, value):
-    matched = []
-    unmatched = []
+def load_file(path, args):
+    """Return the content of a file as rstcheck checks it, and the settings for the file."""
+    with contextlib.closing(docutils.io.FileInput(source_path=path)) as input_file:
+        content = input_file.read()
 
-    for line in value.splitlines():
-        match = re.search(pattern, line)
+    # Settings can be overridden by a .rstcheck.cfg file in the directory of the file.
+    args = rstcheck.load_configuration_from_file(os.path.dirname(os.path.realpath(path)), args)
+    rstcheck.ignore_directives_and_roles(args.ignore_directives, args.ignore_roles)
 
-        if match:
-            matched.append(match.groupdict())
-        else:
-            unmatched.append(line)
+    for substitution in args.ignore_substitutions:
+        content = content.replace(f'|{substitution}|', 'None')
 
-    if unmatched:
-        raise Exception('Pattern "%s" did not match values:\n%s' % (pattern, '\n'.join(unmatched)))
+    return content, args
 
-    return matched
+
+def make_error(path, ex):
+    return dict(path=path, line=0, col=0, level='ERROR', severity='error', message=str(ex))
+
+
+def make_result(path, line, message):
+    match = MESSAGE_RE.match(message)
+    level = match.group('level') if match else 'ERROR'
+
+    return dict(
+        path=path,
+        line=line,
+        col=0,
+        level=level,
+        severity='error' if level == 'SEVERE' else level.lower(),
+        message=match.group('message') if match else message,
+    )
 
 
 if __name__ == '__main__':
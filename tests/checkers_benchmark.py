@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""Benchmark the docs checkers against a synthetic rst corpus."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+CHECKERS_DIR = ROOT / "tests" / "checkers"
+HISTORY_PATH = ROOT / ".cache" / "checkers" / "benchmarks.jsonl"
+
+sys.path.insert(0, str(CHECKERS_DIR))
+
+from _benchmark import append_record, compare, find_previous, make_record  # noqa: E402
+
+MODULES = (
+    "ansible.builtin.debug",
+    "ansible.builtin.copy",
+    "ansible.builtin.file",
+    "ansible.builtin.service",
+)
+WORDS = (
+    "playbook",
+    "inventory",
+    "module",
+    "task",
+    "handler",
+    "variable",
+    "collection",
+    "role",
+    "host",
+    "group",
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--pages",
+        type=int,
+        default=200,
+        help="number of rst pages to generate (default: 200)",
+    )
+    parser.add_argument(
+        "--blocks-per-page",
+        type=int,
+        default=10,
+        help="number of YAML code blocks per page (default: 10)",
+    )
+    parser.add_argument(
+        "--block-lines",
+        type=int,
+        default=12,
+        help="approximate number of lines per YAML code block (default: 12)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="number of timed runs per target, the fastest one is recorded (default: 3)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="jobs passed to the checker runner (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--target",
+        dest="targets",
+        action="append",
+        choices=("rst-yamllint", "rstcheck", "rst-lint", "runner"),
+        help="target to benchmark, can be repeated (default: all)",
+    )
+    parser.add_argument(
+        "--history",
+        type=pathlib.Path,
+        default=HISTORY_PATH,
+        help=f"JSON Lines file the results are appended to (default: {HISTORY_PATH.relative_to(ROOT)})",
+    )
+    parser.add_argument(
+        "--max-regression",
+        metavar="PERCENT",
+        type=float,
+        help="fail if a target is more than PERCENT slower than the previous comparable run",
+    )
+
+    args = parser.parse_args()
+    targets: list[str] = args.targets or [
+        "rst-yamllint",
+        "rstcheck",
+        "rst-lint",
+        "runner",
+    ]
+
+    with tempfile.TemporaryDirectory(prefix="checkers-benchmark-") as temp_dir:
+        corpus_dir = pathlib.Path(temp_dir) / "docs"
+        corpus = generate_corpus(
+            corpus_dir, args.pages, args.blocks_per_page, args.block_lines
+        )
+        paths = [str(path) for path in sorted(corpus_dir.rglob("*.rst"))]
+
+        print(
+            f'Generated {corpus["files"]} page(s) with {corpus["blocks"]} YAML block(s)'
+            f' ({corpus["bytes"] / 1024:.0f} KiB) in {corpus_dir}',
+            file=sys.stderr,
+            flush=True,
+        )
+
+        commands = {
+            "rst-yamllint": [sys.executable, str(CHECKERS_DIR / "rst-yamllint.py")]
+            + paths,
+            "rstcheck": [sys.executable, str(CHECKERS_DIR / "rstcheck.py")] + paths,
+            "rst-lint": [sys.executable, str(CHECKERS_DIR / "rst-lint.py")] + paths,
+            "runner": [
+                sys.executable,
+                str(ROOT / "tests" / "checkers.py"),
+                "--docs-dir",
+                str(corpus_dir),
+                "--no-cache",
+                "--jobs",
+                str(args.jobs),
+                "rst-yamllint",
+                "rstcheck",
+            ],
+        }
+
+        results = {}
+
+        for target in targets:
+            seconds = time_command(commands[target], args.repeat)
+            results[target] = dict(
+                seconds=round(seconds, 3),
+                files_per_second=round(corpus["files"] / seconds, 1),
+                blocks_per_second=round(corpus["blocks"] / seconds, 1),
+            )
+            print(
+                f'{target}: {seconds:.2f} s, {results[target]["files_per_second"]} files/s,'
+                f' {results[target]["blocks_per_second"]} blocks/s',
+                file=sys.stderr,
+                flush=True,
+            )
+
+    record = make_record(results, jobs=args.jobs, corpus=corpus)
+    previous = find_previous(args.history, record, ("corpus", "jobs"))
+    regressions = compare(previous, record, args.max_regression) if previous else []
+    append_record(args.history, record)
+
+    if regressions:
+        sys.exit(
+            f'Regression of more than {args.max_regression}% in: {", ".join(regressions)}'
+        )
+
+
+def generate_corpus(
+    directory: pathlib.Path, pages: int, blocks_per_page: int, block_lines: int
+) -> dict[str, t.Any]:
+    """Write a reproducible rst corpus of similar shape to the docs and return a description of it."""
+    rng = random.Random(0)
+    directory.mkdir(parents=True)
+    total_bytes = 0
+
+    for page in range(pages):
+        title = f"Synthetic page {page}"
+        parts = [f'.. _synthetic_page_{page}:\n\n{title}\n{"=" * len(title)}\n']
+
+        for block in range(blocks_per_page):
+            parts.append(" ".join(rng.choice(WORDS) for dummy in range(40)) + ".\n")
+            parts.append(
+                ".. code-block:: yaml\n\n" + generate_yaml(rng, block_lines) + "\n"
+            )
+
+            if block % 3 == 0:
+                parts.append(
+                    ".. code-block:: bash\n\n    ansible-playbook -i inventory.ini site.yml\n"
+                )
+
+        content = "\n".join(parts)
+        path = directory / f"section_{page % 10}" / f"page_{page}.rst"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+        total_bytes += len(content.encode("utf-8"))
+
+    return dict(
+        pages=pages,
+        blocks_per_page=blocks_per_page,
+        block_lines=block_lines,
+        files=pages,
+        blocks=pages * blocks_per_page,
+        bytes=total_bytes,
+    )
+
+
+def generate_yaml(rng: random.Random, lines: int) -> str:
+    """Return an indented playbook snippet with about ``lines`` lines."""
+    snippet = ["- name: Synthetic play", "  hosts: all", "  tasks:"]
+
+    while len(snippet) < lines:
+        word = rng.choice(WORDS)
+        snippet.extend(
+            [
+                f"    - name: Handle the {word}",
+                f"      {rng.choice(MODULES)}:",
+                f'        msg: "{{{{ {word}_{rng.randrange(100)} }}}}"',
+            ]
+        )
+
+    return "".join(f"    {line}\n" for line in snippet)
+
+
+def time_command(cmd: list[str], repeat: int) -> float:
+    """Return the fastest wall time of ``repeat`` runs of the command."""
+    timings = []
+    # Measure cold runs, without the caches checkers keep between runs (see tests/checkers/_cache.py).
+    env = dict(os.environ, CHECKERS_NO_CACHE="1")
+
+    for dummy in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = subprocess.run(
+            cmd,
+            cwd=ROOT,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        timings.append(time.perf_counter() - start)
+
+        if result.returncode != 0 or result.stdout:
+            sys.exit(
+                f"Command {cmd[1]!r} reported problems on the synthetic corpus:\n{result.stdout}{result.stderr}"
+            )
+
+    return min(timings)
+
+
+if __name__ == "__main__":
+    main()